@@ -0,0 +1,235 @@
+import asyncio
+import signal
+import sys
+import time
+from typing import Dict, Optional, Set
+
+from .registry import Script
+from .executor import Completion
+from .runner import run_script_async, set_backend
+from .daemon import DaemonCore, _report, make_backend
+from .daemon_state import write_pid, clear_pid
+from .sources import close_source, load_plugins, next_poll_timeout, poll_once, poll_once_async, source_factories
+
+# In-flight runs are tasks, not threads; this only guards against fork/fd exhaustion
+MAX_CONCURRENT_RUNS = 256
+
+def _use_pidfd_watcher() -> None:
+    # Python < 3.12 defaults to a watcher thread per child; a pidfd on the loop is cheaper
+    if sys.version_info >= (3, 12) or not sys.platform.startswith("linux"):
+        return
+    try:
+        import os
+        os.close(os.pidfd_open(os.getpid()))
+        asyncio.get_event_loop_policy().set_child_watcher(asyncio.PidfdChildWatcher())
+    except (AttributeError, OSError, NotImplementedError):
+        pass
+
+class AsyncDaemon:
+    """
+    asyncio runtime for DaemonCore: each event source is its own task, runs are asyncio
+    subprocesses (runner.run_script_async), and the timer task sleeps until the core's
+    next deadline or until something wakes it.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = 0.5,
+        max_runs: int = MAX_CONCURRENT_RUNS,
+        max_running: Optional[int] = None,
+        class_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.poll_interval = poll_interval
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self.woken = asyncio.Event()
+        self.sem = asyncio.Semaphore(max_runs)
+        self.running: Set[str] = set()
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.source_tasks: Dict[str, asyncio.Task] = {}
+        self.core = DaemonCore(self.submit, self.running, self.wake)
+        self.core.max_running = max_running
+        self.core.class_limits = dict(class_limits or {})
+
+    def wake(self) -> None:
+        # Completion bus callbacks can arrive from runner threads (warm/zygote backends)
+        try:
+            self.loop.call_soon_threadsafe(self.woken.set)
+        except RuntimeError:
+            pass
+
+    def submit(
+        self,
+        script: Script,
+        payload: dict,
+        label: str,
+        detail: str = "",
+        timeout_seconds: float = 20.0,
+        queue_meta: Optional[dict] = None,
+    ) -> bool:
+        if script.id in self.running:
+            return False
+        self.running.add(script.id)
+        self.tasks[script.id] = self.loop.create_task(self._run(script, payload, label, detail, timeout_seconds, queue_meta))
+        return True
+
+    async def _run(
+        self,
+        script: Script,
+        payload: dict,
+        label: str,
+        detail: str,
+        timeout_seconds: float,
+        queue_meta: Optional[dict],
+    ) -> None:
+        ok, run_id, error = False, None, None
+        try:
+            async with self.sem:
+                ok, run_id = await run_script_async(script, timeout_seconds=timeout_seconds, payload=payload, queue_meta=queue_meta)
+        except asyncio.CancelledError:
+            error = "cancelled"
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self.running.discard(script.id)
+            self.tasks.pop(script.id, None)
+            _report([Completion(script.id, label, detail, ok, run_id, error)])
+            self.core.run_finished(script.id, time.time(), run_id)
+            self.woken.set()
+
+    async def source_task(self, name: str) -> None:
+        # Sources with poll_async run on the loop, the rest in a worker thread;
+        # event-driven sources (fileno()) are polled on the loop when their fd is readable
+        src = self.core.new_source(name)
+        stats = self.core.source_stats[name]
+        readable = asyncio.Event()
+        fd = None
+        try:
+            while not self.stopping.is_set():
+                t0 = time.monotonic()
+                readable.clear()
+                events = poll_once(src, stats) if fd is not None else await poll_once_async(src, stats)
+                self.core.events.put(events, stats)
+
+                if src.fileno() != fd:
+                    if fd is not None:
+                        self.loop.remove_reader(fd)
+                    fd = src.fileno()
+                    if fd is not None:
+                        self.loop.add_reader(fd, readable.set)
+
+                timeout = next_poll_timeout(src, time.monotonic() - t0)
+                waits = [self.loop.create_task(self.stopping.wait()), self.loop.create_task(readable.wait())]
+                try:
+                    await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for w in waits:
+                        w.cancel()
+        finally:
+            if fd is not None:
+                self.loop.remove_reader(fd)
+            close_source(src)
+
+    def sync_sources(self) -> None:
+        wanted = self.core.wanted_sources
+        if wanted == self.source_tasks.keys():
+            return
+        for name in self.source_tasks.keys() - wanted:
+            self.source_tasks.pop(name).cancel()
+        for name in wanted - self.source_tasks.keys():
+            self.source_tasks[name] = self.loop.create_task(self.source_task(name))
+
+    async def timer_task(self) -> None:
+        core = self.core
+        while not self.stopping.is_set():
+            self.woken.clear()
+            now = time.time()
+            core.refresh(now)
+            self.sync_sources()
+            core.handle_events(core.events.drain(), now)
+            core.dispatch_failures()
+            core.run_due(now)
+            core.poll_file_watches(now)
+            core.run_pending(now)
+
+            timeout = core.next_wake(now, self.poll_interval) - time.time()
+            try:
+                await asyncio.wait_for(self.woken.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            self.loop.add_signal_handler(sig, self._stop)
+        self.loop.add_signal_handler(signal.SIGUSR1, self.wake)
+
+        # Only once SIGUSR1 is handled: enable/disable signal whatever pid is in the file
+        write_pid()
+        watch_fd = self.core.watch_fd
+        if watch_fd is not None:
+            self.loop.add_reader(watch_fd, self.woken.set)
+
+        for err in load_plugins():
+            print(f"Event source plugin failed to load: {err}")
+        self.core.source_factories = source_factories()
+
+        timer = self.loop.create_task(self.timer_task())
+        try:
+            await self.stopping.wait()
+        finally:
+            detectors = [timer, *self.source_tasks.values()]
+            for t in detectors:
+                t.cancel()
+            await asyncio.gather(*detectors, return_exceptions=True)
+
+            # Let in-flight runs finish so their results are logged
+            await asyncio.gather(*list(self.tasks.values()), return_exceptions=True)
+            if watch_fd is not None:
+                self.loop.remove_reader(watch_fd)
+            self.core.close()
+            clear_pid()
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                self.loop.remove_signal_handler(sig)
+        return 0
+
+    def _stop(self) -> None:
+        self.stopping.set()
+        self.woken.set()
+
+async def run(
+    poll_interval: float = 0.5,
+    max_workers: int = 8,
+    exec_mode: str = "cold",
+    max_running: Optional[int] = None,
+    class_limits: Optional[Dict[str, int]] = None,
+) -> int:
+    pool = make_backend(exec_mode, max_workers)
+    if pool is not None:
+        set_backend(pool)
+    try:
+        return await AsyncDaemon(poll_interval=poll_interval, max_running=max_running, class_limits=class_limits).run()
+    finally:
+        if pool is not None:
+            set_backend(None)
+            pool.close()
+
+def main(
+    poll_interval: float = 0.5,
+    max_workers: int = 8,
+    exec_mode: str = "cold",
+    max_running: Optional[int] = None,
+    class_limits: Optional[Dict[str, int]] = None,
+) -> int:
+    """
+    Same triggers and records as daemon.main, on a single asyncio event loop.
+    max_workers only sizes the warm pool; cold runs are bounded by MAX_CONCURRENT_RUNS,
+    and by max_running / class_limits (see DaemonCore) when given.
+    """
+
+    print("Control Core daemon starting (asyncio)...(Ctrl+C to stop)")
+    _use_pidfd_watcher()
+    return asyncio.run(run(poll_interval, max_workers, exec_mode, max_running, class_limits))
+
+if __name__ == "__main__":
+    raise SystemExit(main())
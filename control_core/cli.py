@@ -7,12 +7,13 @@ from .installer import install_script_from_folder
 from .logs import last_run_by_script, tail_follow
 from .validator import validate_script_folder, validate_times, validate_dom
 from .daemon_state import read_pid, pid_is_running, PID_PATH, LOCKS_DIR
-from .stats import compute_stats
+from .stats import compute_lock_stats, compute_stats
 from .history import get_history, format_event
 from .log_rotate import rotate_logs
 from .exporter import export_csv
 from .report import build_report, format_report
-from .locks import acquire_file_lock, release_file_lock
+from .locks import read_locks
+from .runstore import RunStore, import_logs, store_enabled
 from .scheduler_state import load_state
 from .scheduler import get_interval_seconds
 
@@ -228,16 +229,18 @@ def main(argv=None) -> int:
         if len(argv) < 3:
             print("Usage: python -m control_core.cli set-events <id> <event1, event2,...?"
                   "--apps <app1,app2,...>] [--seconds <N>]")
-            print("Events: idle, app_open, app_close, network_up, network_down")
+            print("Events: idle, app_open, app_close, network_up, network_down, or any custom type (see emit)")
+            return 2
 
         script_id = argv[1]
         raw_events = argv[2]
         events = [e.strip() for e in raw_events.split(",") if e.strip()]
 
-        allowed = {"idle", "app_open", "app_close", "network_up", "network_down"}
-        bad = [e for e in events if e not in allowed]
+        # Built-in detector events, or custom types pushed through the ingestion socket
+        from .ingest import valid_event_type
+        bad = [e for e in events if e != "idle" and not valid_event_type(e)]
         if bad:
-            print(f"Unknown event(s): {bad}. Allowed {sorted(allowed)}")
+            print(f"Invalid event name(s): {bad}. Use letters, digits, '_', '.', ':', '-' (max 64)")
             return 2
         
         # -- apps
@@ -358,6 +361,42 @@ def main(argv=None) -> int:
         print(f"Set {script_id} to run on network_down")
         return 0
     
+    if cmd == "emit":
+        if len(argv) < 2:
+            print("Usage: python -m control_core.cli emit <event_type> [--payload <json object>]")
+            return 2
+
+        from .ingest import INGEST_PATH, send_events, valid_event_type
+        ev_type = argv[1]
+        if not valid_event_type(ev_type):
+            print(f"Invalid event type: {ev_type}")
+            return 2
+
+        event = {}
+        if "--payload" in argv:
+            i = argv.index("--payload")
+            if i + 1 >= len(argv):
+                print("Missing value after --payload")
+                return 2
+            import json as _json
+            try:
+                event = _json.loads(argv[i + 1])
+            except Exception as e:
+                print(f"Invalid JSON for --payload: {e}")
+                return 2
+            if not isinstance(event, dict):
+                print("--payload must be a JSON object")
+                return 2
+        event["type"] = ev_type
+
+        try:
+            send_events([event])
+        except OSError as e:
+            print(f"No daemon listening on {INGEST_PATH} ({e})")
+            return 1
+        print(f"Emitted {ev_type}")
+        return 0
+
     if cmd == "install":
         if len(argv) < 2:
             print("Usage: python -m control_core.cli install <folder> [--force]")
@@ -378,7 +417,7 @@ def main(argv=None) -> int:
 
     if cmd == "status":
         scripts = discover_scripts()
-        last = last_run_by_script()
+        last = last_run_by_script(scripts.keys())
 
         for sid in sorted(scripts.keys()):
             s = scripts[sid]
@@ -450,6 +489,20 @@ def main(argv=None) -> int:
             return 1
         if pid_is_running(pid):
             print(f"Daemon is running with pid {pid} (pid file: {PID_PATH})")
+
+            # Per event source counters, as last saved by the daemon
+            from .sources import load_source_stats
+            data = load_source_stats()
+            if data:
+                print(f"Event sources (as of {time.strftime('%H:%M:%S', time.localtime(data.get('updated_at', 0)))}):")
+                for name, st in data.get("sources", {}).items():
+                    avg_ms = 1000 * st["total_poll_seconds"] / st["polls"] if st["polls"] else 0.0
+                    print(
+                        f" - {name}: polls={st['polls']} events={st['events']} dropped={st['dropped']} "
+                        f"rejected={st.get('rejected', 0)} rate_limited={st.get('rate_limited', 0)} "
+                        f"errors={st['errors']} overruns={st['overruns']} "
+                        f"avg={avg_ms:.1f}ms max={1000 * st['max_poll_seconds']:.1f}ms"
+                    )
             return 0
         print(f"Stale pid file: pid={pid} not running (pid file: {PID_PATH})")
         return 1
@@ -534,6 +587,16 @@ def main(argv=None) -> int:
             print(f"Rotated logs to {archived}")
         return 0
 
+    if cmd == "store-import":
+        # Backfill the SQLite run store (CONTROL_CORE_RUN_STORE=sqlite) from the JSONL logs
+        store = RunStore()
+        added = import_logs(store)
+        print(f"Imported {added} runs into {store.path} ({store.count()} total)")
+        if not store_enabled():
+            print("Note: set CONTROL_CORE_RUN_STORE=sqlite (daemon and CLI) to write and read it")
+        store.close()
+        return 0
+
     if cmd == "export":
         if len(argv) < 2:
             print("Usage: python -m control_core.cli export <output.csv> [max_rows]")
@@ -632,9 +695,6 @@ def main(argv=None) -> int:
             
             payload.update(user_payload)
 
-        from .registry import discover_scripts
-        from .runner import run_script
-
         scripts = discover_scripts()
         s = scripts.get(script_id)
         if not s:
@@ -649,23 +709,48 @@ def main(argv=None) -> int:
         return 0
     
     if cmd == "locks":
-        LOCKS_DIR.mkdir(parents=True, exist_ok=True)
+        if "--stats" in argv:
+            # Usage: locks --stats [n]
+            n = 1000
+            rest = [a for a in argv[1:] if a != "--stats"]
+            if rest:
+                try:
+                    n = int(rest[0])
+                except ValueError:
+                    print("Usage: python -m control_core.cli locks --stats [n]")
+                    return 2
+
+            stats = compute_lock_stats(last_n=n)
+            if not stats:
+                print("No locked runs in the logs yet.")
+                return 0
+
+            # Groups costing the most waiting (then skipping) first
+            print(f"Lock contention (last {n} locked runs):")
+            print(f"{'group':20} {'runs':>5} {'skips':>5} {'skip':>6} {'p50_ms':>8} {'p95_ms':>8} {'max_ms':>8} {'total_s':>8}")
+            for group, d in sorted(stats.items(), key=lambda kv: (-kv[1]["total_wait"], -kv[1]["skips"])):
+                print(
+                    f"{group:20} {d['runs']:5} {d['skips']:5} {d['skip_rate'] * 100:5.1f}% "
+                    f"{d['p50_wait'] * 1000:8.1f} {d['p95_wait'] * 1000:8.1f} {d['max_wait'] * 1000:8.1f} {d['total_wait']:8.1f}"
+                )
+            return 0
 
-        lock_files = sorted(LOCKS_DIR.glob("*.lock"))
-        if not lock_files:
+        # Reads the kernel lock table and holder metadata; never takes a lock itself
+        locks = read_locks(str(LOCKS_DIR))
+        if not locks:
             print(f"No lock files in {LOCKS_DIR}")
             return 0
-        
+
         print(f"Locks in {LOCKS_DIR}:")
-        for p in lock_files:
-            group = p.stem
-            res, fd = acquire_file_lock(str(LOCKS_DIR), group, timeout_seconds=0.0)
-            if res.acquired and fd is not None:
-                release_file_lock(fd)
-                status = "FREE"
-            else:
-                status = "BUSY"
-            print(f" - {group:20} {status}")
+        now = time.time()
+        for info in locks:
+            status = "BUSY" if info.busy else "FREE"
+            line = f" - {info.group:20} {status}"
+            h = info.holder
+            if h:
+                held = now - float(h.get("acquired_at") or now)
+                line += f" pid={h.get('pid')} script={h.get('script_id', '?')} run_id={h.get('run_id', '?')} held={held:.1f}s"
+            print(line)
         return 0
             
     print(f"Unknown command: {cmd}")
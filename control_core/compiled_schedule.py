@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from zoneinfo import ZoneInfo
+
+DEFAULT_TZ = "America/New_York"
+
+@lru_cache(maxsize=None)
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TZ)
+    except Exception:
+        return ZoneInfo(DEFAULT_TZ)
+
+def _mask(values, lo: int, hi: int) -> int:
+    """
+    Bit i set for every int i in [lo, hi]. 0 means "no constraint".
+    """
+
+    m = 0
+    for v in values or ():
+        try:
+            v = int(v)
+        except Exception:
+            continue
+        if lo <= v <= hi:
+            m |= 1 << v
+    return m
+
+@dataclass(frozen=True, slots=True)
+class CompiledSchedule:
+    """
+    Interval/time schedule parsed once at manifest load.
+    Time schedules keep their slots as sorted minutes-of-day (with the matching
+    "HH:MM" state keys) and day-of-week/month/day-of-month as bitmasks.
+    """
+
+    kind: str
+    interval: float = 0.0
+    tz: Optional[ZoneInfo] = None
+    minutes: Tuple[int, ...] = ()
+    keys: Tuple[str, ...] = ()
+    dow_mask: int = 0
+    month_mask: int = 0
+    dom_mask: int = 0
+
+    def day_allowed(self, dt: datetime) -> bool:
+        if self.dow_mask and not (self.dow_mask >> dt.isoweekday()) & 1:
+            return False
+        if self.month_mask and not (self.month_mask >> dt.month) & 1:
+            return False
+        if self.dom_mask and not (self.dom_mask >> dt.day) & 1:
+            return False
+        return True
+
+def compile_schedule(sched: dict) -> Optional[CompiledSchedule]:
+    """
+    Compiles a normalized interval/time schedule; None for every other type or an unusable one.
+    """
+
+    if not isinstance(sched, dict):
+        return None
+    stype = sched.get("type")
+
+    if stype == "interval":
+        try:
+            seconds = float(sched.get("seconds"))
+        except Exception:
+            return None
+        return CompiledSchedule(kind="interval", interval=seconds) if seconds > 0 else None
+
+    if stype != "time":
+        return None
+
+    at = sched.get("at")
+    if isinstance(at, str):
+        raw = [at]
+    elif isinstance(at, list):
+        raw = [x for x in at if isinstance(x, str)]
+    else:
+        return None
+
+    minutes = set()
+    for t in raw:
+        try:
+            hh, mm = (int(x) for x in t.strip().split(":"))
+        except Exception:
+            continue
+        if 0 <= hh <= 23 and 0 <= mm <= 59:
+            minutes.add(hh * 60 + mm)
+    if not minutes:
+        return None
+
+    ordered = tuple(sorted(minutes))
+    month_mask = _mask(sched.get("months"), 1, 12)
+    return CompiledSchedule(
+        kind="time",
+        tz=get_zone(sched.get("tz")),
+        minutes=ordered,
+        keys=tuple(f"{m // 60:02d}:{m % 60:02d}" for m in ordered),
+        dow_mask=_mask(sched.get("days"), 1, 7),
+        month_mask=month_mask,
+        dom_mask=_mask(sched.get("dom"), 1, 31) if month_mask else 0,
+    )
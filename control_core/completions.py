@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+class CompletionBus:
+    """
+    In-process fan-out of finished run records.
+    runner.log_event publishes every record here before it is written to disk,
+    so subscribers in the same process never have to read them back from the log.
+    Callbacks run on the publishing thread and must be quick.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: List[Callable[[Dict[str, Any]], None]] = []
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        with self._lock:
+            self._subs = [*self._subs, callback]
+
+        def _unsubscribe() -> None:
+            with self._lock:
+                self._subs = [c for c in self._subs if c is not callback]
+
+        return _unsubscribe
+
+    def publish(self, record: Dict[str, Any]) -> None:
+        for cb in self._subs:
+            try:
+                cb(record)
+            except Exception:
+                pass
+
+completion_bus = CompletionBus()
+
+class RecentIds:
+    """
+    Bounded, thread-safe set of recently seen run ids.
+    """
+
+    def __init__(self, maxlen: int = 4096):
+        self._lock = threading.Lock()
+        self._order: deque = deque()
+        self._ids: set = set()
+        self._maxlen = maxlen
+
+    def add(self, run_id: Optional[str]) -> None:
+        if not run_id:
+            return
+        with self._lock:
+            if run_id in self._ids:
+                return
+            self._ids.add(run_id)
+            self._order.append(run_id)
+            if len(self._order) > self._maxlen:
+                self._ids.discard(self._order.popleft())
+
+    def __contains__(self, run_id: object) -> bool:
+        with self._lock:
+            return run_id in self._ids
+
+class LogTailer:
+    """
+    Follows a JSONL log for records appended by other processes.
+    Keeps one fd open and costs a single stat() per poll while the file is unchanged.
+    A trailing partial line is buffered until its newline arrives; on rotation the
+    old file is drained before switching to the new one.
+    """
+
+    def __init__(self, path: Path, chunk_size: int = 64 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._fd: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._pos = 0
+        self._buf = b""
+
+    def _open(self, at_end: bool) -> None:
+        self.close()
+        try:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        st = os.fstat(self._fd)
+        self._ino = st.st_ino
+        self._pos = st.st_size if at_end else 0
+        self._buf = b""
+
+    def seek_end(self) -> None:
+        self._open(at_end=True)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._ino = None
+
+    def _read_available(self) -> List[dict]:
+        out: List[dict] = []
+        while True:
+            data = os.pread(self._fd, self.chunk_size, self._pos)
+            if not data:
+                break
+            self._pos += len(data)
+            self._buf += data
+            *lines, self._buf = self._buf.split(b"\n")
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    out.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+        return out
+
+    def poll(self) -> List[dict]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+
+        out: List[dict] = []
+        if self._fd is not None and (st is None or st.st_ino != self._ino):
+            # Rotated or removed: finish the old file first
+            out.extend(self._read_available())
+            self.close()
+
+        if st is None:
+            return out
+
+        if self._fd is None:
+            # New file since last poll: read it from the start
+            self._open(at_end=False)
+            if self._fd is None:
+                return out
+
+        if st.st_size < self._pos:
+            # Truncated in place
+            self._pos = 0
+            self._buf = b""
+        if st.st_size == self._pos:
+            return out
+
+        out.extend(self._read_available())
+        return out
@@ -1,369 +1,623 @@
-import json
+import os
+import queue
 import time
 import signal
 from pathlib import Path
-from typing import Dict, Set
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
 
-from .registry import discover_scripts
-from .runner import run_script
+from .registry import RegistryCache, Script
+from .executor import RunExecutor
+from .runner import log_writer, set_backend
+from .workers import WorkerPool
+from .zygote import Zygote
 from .daemon_state import write_pid, clear_pid
 from .scheduler_state import load_state, save_state
-from .scheduler import due_to_run, mark_fired
-from .events import get_idle_seconds_macos, get_local_ip, match_apps, list_running_apps_macos, normalize_app_name
+from .scheduler import DeadlineScheduler, due_to_run, mark_fired, next_due_at
+from .events import normalize_app_name
+from .subscriptions import APP_EVENTS, SubscriptionIndex
+from .wakeup import Waker
+from .completions import LogTailer, RecentIds, completion_bus
+from .filewatch import FileWatcher, WatchSpec
+from .runqueue import PendingRun, RunQueue
+from .sources import (
+    EventQueue,
+    EventSource,
+    SourceStats,
+    SourceThread,
+    load_plugins,
+    save_source_stats,
+    source_factories,
+    wanted_sources,
+)
 
 LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
 
+# Upper bound on how long the daemon sleeps, so hand-edited manifests are still noticed
+REGISTRY_RECHECK_SECONDS = 5.0
+
+IDLE_RESET_SECONDS = 3.0
+EVENT_SCRIPT_COOLDOWN_SECONDS = 2.0
+APP_EVENT_COOLDOWN_SECONDS = 5.0
+SOURCE_STATS_SAVE_SECONDS = 10.0
+
 def _abs_path(p: str) -> Path:
     project_root = Path(__file__).resolve().parent.parent
     return (project_root / p).resolve()
 
-def main(poll_interval: float = 0.5) -> int:
+def _watch_path(p: str) -> str:
+    # Unresolved, so a trailing slash (directory watch) and glob characters survive
+    project_root = Path(__file__).resolve().parent.parent
+    return os.path.join(project_root, p)
+
+def _report(completions) -> None:
+    for c in completions:
+        if c.error is not None:
+            print(f"[{time.strftime('%H:%M:%S')}] {c.label} -> {c.script_id} crashed: {c.error!r}")
+            continue
+        detail = f" ({c.detail})" if c.detail else ""
+        print(f"[{time.strftime('%H:%M:%S')}] {c.label} -> ran {c.script_id} ok={c.ok} run_id={c.run_id}{detail}")
+
+def make_backend(exec_mode: str, max_workers: int):
+    """
+    exec_mode: "cold" starts a fresh interpreter per run; "warm" reuses a pool of
+    long-lived worker processes (workers.WorkerPool) that keep script modules imported;
+    "zygote" forks each run from a preloaded fork server (zygote.Zygote).
+    """
+
+    if exec_mode == "warm":
+        return WorkerPool(size=max_workers)
+    if exec_mode == "zygote":
+        return Zygote()
+    return None
+
+def parse_class_limits(spec: str) -> Dict[str, int]:
+    """
+    "batch=2,default=4" -> {"batch": 2, "default": 4}. Raises ValueError on bad entries.
+    """
+
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, n = part.partition("=")
+        if not name.strip() or int(n) < 1:
+            raise ValueError(part)
+        limits[name.strip()] = int(n)
+    return limits
+
+SubmitFn = Callable[..., bool]
+
+class DaemonCore:
+    """
+    Trigger and dispatch state shared by the threaded loop (main) and the asyncio runtime
+    (async_daemon). A runtime feeds it the clock and detector readings; the core decides
+    what should run and hands it to submit(script, payload=..., label=..., detail=..., queue_meta=...).
+    `running` is the runtime's set of in-flight script ids; triggers for a running script
+    go through its queue_policy (runqueue.RunQueue) and are submitted by run_pending().
+    Runs start only while `max_running` and their concurrency class's limit allow; the
+    rest wait in `waiting` and are admitted highest priority first, then oldest first.
+    Not thread-safe: drive it from a single thread or event loop.
+    """
+
+    def __init__(self, submit: SubmitFn, running: Set[str], wake: Callable[[], None]):
+        self.submit = submit
+        self.running = running
+
+        # Persistent scheduler state for interval triggers
+        self.sched_state: Dict[str, dict] = load_state()
+        self.sched_dirty = False
+
+        # File watches: inotify where available, per-script polling otherwise
+        self.watcher = FileWatcher()
+
+        # Manifests are only reparsed when they change on disk
+        self.registry = RegistryCache()
+        self.seen_generation = -1
+        self.scripts: Dict[str, Script] = {}
+        self.index = SubscriptionIndex({})
+        self.needs_poll = False
+
+        # Interval/time deadlines; due scripts that were still running wait for their completion
+        self.deadlines = DeadlineScheduler()
+        self.deferred: Set[str] = set()
+
+        # Event sources (see sources.py) run on their own threads/tasks and feed this queue.
+        # Only the sources some enabled script needs are wanted; runtimes start/stop to match.
+        self.events = EventQueue(wake)
+        self.source_factories = source_factories()
+        self.wanted_sources: Set[str] = set()
+        self.source_stats: Dict[str, SourceStats] = {}
+        self.next_stats_save = 0.0
+
+        # Triggers waiting for their script to finish, and what each running script was started with
+        self.queue = RunQueue()
+        self.inflight: Dict[str, Tuple[Script, PendingRun]] = {}
+        self.lock_skipped = RecentIds()
+
+        # Admission: ready runs wait here while their class (or the daemon) is at its limit
+        self.max_running: Optional[int] = None
+        self.class_limits: Dict[str, int] = {}
+        self.class_running: Dict[str, int] = {}
+        self.waiting: Dict[str, PendingRun] = {}
+
+        # Dispatch state
+        self.idle_fired: Dict[str, bool] = {}
+        self.event_cooldown: Dict[tuple, float] = {}
+        self.app_event_cooldown: Dict[tuple, float] = {}
+
+        # Failed runs: this process's arrive on the completion bus, other writers' (CLI trigger) via the tailer
+        self.failed_runs: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+        self.local_run_ids = RecentIds()
+
+        def _on_completion(record: dict) -> None:
+            self.local_run_ids.add(record.get("run_id"))
+            if record.get("skipped_due_to_lock"):
+                self.lock_skipped.add(record.get("run_id"))
+            if record.get("ok") is not True:
+                self.failed_runs.put(record)
+                wake()
+
+        self._unsubscribe = completion_bus.subscribe(_on_completion)
+        self.tailer = LogTailer(LOG_PATH)
+        self.tailing = False
+
+    def refresh(self, now: float) -> Dict[str, Script]:
+        scripts = self.scripts = self.registry.refresh()
+        if self.registry.generation == self.seen_generation:
+            return scripts
+
+        # Rebuild derived state and purge state for disabled/missing scripts
+        self.seen_generation = self.registry.generation
+        self.index = SubscriptionIndex(scripts)
+        self.deadlines.rebuild(scripts, self.sched_state, now)
+        self.deferred.clear()
+
+        # Only follow the log while someone handles failures
+        if self.index.on_failure and not self.tailing:
+            self.tailer.seek_end()
+            self.tailing = True
+        elif not self.index.on_failure and self.tailing:
+            self.tailer.close()
+            self.tailing = False
+
+        watches = {}
+        for sid, s in scripts.items():
+            sched = s.schedule or {}
+            if s.enabled and sched.get("type") == "file_watch" and sched.get("path"):
+                watches[sid] = WatchSpec(
+                    path=_watch_path(sched["path"]),
+                    poll_seconds=float(sched.get("poll_seconds", 1.0) or 1.0),
+                    settle_seconds=float(sched.get("settle_seconds", 0.0) or 0.0),
+                    content_hash=bool(sched.get("content_hash", False)),
+                )
+        self.watcher.set_watches(watches)
+
+        event_types = set(self.index.by_event) | set(self.index.by_app)
+        if self.index.idle:
+            event_types.add("idle")
+        self.wanted_sources = wanted_sources(self.source_factories, event_types)
+
+        # Only the failure log needs the fast tick (sources wake the loop, polled file
+        # watches schedule their own wake-ups)
+        self.needs_poll = bool(self.index.on_failure)
+
+        enabled_ids = {sid for sid, s in scripts.items() if s.enabled}
+        for sid in list(self.sched_state.keys()):
+            if sid not in enabled_ids:
+                self.sched_state.pop(sid, None)
+        for sid in self.queue.script_ids():
+            if sid not in enabled_ids:
+                self.queue.discard(sid)
+        for sid in list(self.waiting):
+            if sid not in enabled_ids:
+                del self.waiting[sid]
+        return scripts
+
+    def trigger(self, s: Script, payload: dict, label: str, detail: str = "") -> bool:
+        """
+        Readies a run (run_pending() starts it), or hands the trigger to the script's
+        queue_policy when it is busy. False when the trigger was dropped.
+        """
+
+        run = PendingRun(payload=payload, label=label, detail=detail)
+        if self.busy(s.id) or s.id in self.queue:
+            self.queue.offer(s, run)
+            return s.queue_policy != "drop"
+        # Started by run_pending(), so triggers from the same pass are admitted by priority
+        self.waiting[s.id] = run
+        return True
+
+    def busy(self, script_id: str) -> bool:
+        """
+        Running, or ready and waiting for a free slot.
+        """
+
+        return script_id in self.running or script_id in self.waiting
+
+    def _has_slot(self, s: Script) -> bool:
+        if self.max_running is not None and len(self.inflight) >= self.max_running:
+            return False
+        limit = self.class_limits.get(s.concurrency_class)
+        return limit is None or self.class_running.get(s.concurrency_class, 0) < limit
+
+    def _admit(self) -> None:
+        if not self.waiting:
+            return
+        order = sorted(self.waiting.items(), key=lambda kv: (-self._priority(kv[0]), kv[1].queued_at))
+        for sid, run in order:
+            s = self.scripts.get(sid)
+            if s is None:
+                del self.waiting[sid]
+                continue
+            if sid in self.running or not self._has_slot(s):
+                continue
+            del self.waiting[sid]
+            self._start(s, run)
+
+    def _priority(self, script_id: str) -> int:
+        s = self.scripts.get(script_id)
+        return s.priority if s is not None else 0
+
+    def _start(self, s: Script, run: PendingRun) -> None:
+        queue_meta = {
+            "priority": s.priority,
+            "concurrency_class": s.concurrency_class,
+            "queue_wait_seconds": round(max(0.0, time.time() - run.queued_at), 3),
+            "queue_policy": s.queue_policy,
+            "queue_depth": self.queue.depth(s.id),
+            "coalesced_triggers": run.triggers,
+            "dropped_triggers": self.queue.take_dropped(s.id),
+        }
+        if run.lock_retries:
+            queue_meta["lock_retries"] = run.lock_retries
+
+        detail = run.detail
+        if run.triggers > 1:
+            detail = f"{detail}, {run.triggers} triggers" if detail else f"{run.triggers} triggers"
+        if self.submit(s, payload=run.payload, label=run.label, detail=detail, queue_meta=queue_meta):
+            self.inflight[s.id] = (s, run)
+            cls = s.concurrency_class
+            self.class_running[cls] = self.class_running.get(cls, 0) + 1
+
+    def run_pending(self, now: float) -> None:
+        """
+        Moves queued runs that are ready (and whose script is idle) to admission, then
+        starts whatever the limits allow.
+        """
+
+        for sid in self.queue.ready_ids(now):
+            if self.busy(sid):
+                continue
+            run = self.queue.pop(sid, now)
+            if sid in self.scripts and run is not None:
+                self.waiting[sid] = run
+        self._admit()
+
+    def run_finished(self, script_id: str, now: float, run_id: Optional[str] = None) -> None:
+        if script_id in self.deferred:
+            self.deferred.discard(script_id)
+            self.deadlines.set_deadline(script_id, now)
+
+        entry = self.inflight.pop(script_id, None)
+        if entry is None:
+            return
+        cls = entry[0].concurrency_class
+        self.class_running[cls] = max(0, self.class_running.get(cls, 0) - 1)
+
+        # Skipped because its lock group was busy: retry later unless the policy drops
+        if run_id is not None and run_id in self.lock_skipped:
+            self.queue.requeue(entry[0], entry[1], now)
+
+    def observe_idle(self, idle_seconds: Optional[float]) -> None:
+        if idle_seconds is None:
+            return
+        if idle_seconds < IDLE_RESET_SECONDS:
+            self.idle_fired.clear()
+
+        # Subscribers are sorted by threshold
+        for threshold, s in self.index.idle:
+            if idle_seconds < threshold:
+                break
+            sid = s.id
+            if self.idle_fired.get(sid):
+                continue
+
+            self.idle_fired[sid] = True
+            self.trigger(
+                s,
+                payload={"event": {"type": "idle", "idle_seconds": idle_seconds}, "trigger": "event"},
+                label="event",
+                detail="event=idle",
+            )
+
+    def new_source(self, name: str) -> EventSource:
+        """
+        A fresh instance of a registered source; its counters persist across restarts.
+        """
+
+        self.source_stats.setdefault(name, SourceStats())
+        return self.source_factories[name]()
+
+    def handle_events(self, events: Iterable[dict], now: float) -> None:
+        """
+        Dispatches what the sources queued: idle samples go through the per-threshold
+        idle logic, app events through the per-app cooldown, everything else straight
+        to its subscribers.
+        """
+
+        dispatch = []
+        for ev in events:
+            ev_type = ev.get("type")
+            if ev_type == "idle":
+                self.observe_idle(ev.get("idle_seconds"))
+                continue
+
+            if ev_type in APP_EVENTS:
+                k = (ev_type, ev.get("app"))
+                last = self.app_event_cooldown.get(k, 0.0)
+                if now - last < APP_EVENT_COOLDOWN_SECONDS:
+                    continue
+                self.app_event_cooldown[k] = now
+                ev = {**ev, "app": normalize_app_name(ev.get("app") or "")}
+
+            dispatch.append(ev)
+        self.dispatch_events(dispatch, now)
+
+        if now >= self.next_stats_save and self.source_stats:
+            self.next_stats_save = now + SOURCE_STATS_SAVE_SECONDS
+            save_source_stats(self.source_stats)
+
+    def dispatch_events(self, events: Iterable[dict], now: float) -> None:
+        # Only the subscribers of each event are touched
+        for ev in events:
+            ev_type = ev.get("type")
+            for s in self.index.subscribers(ev):
+                sid = s.id
+
+                # Script cooldown per (sid, want)
+                ck = (sid, ev_type)
+                last = self.event_cooldown.get(ck, 0.0)
+                payload = {"event": ev, "trigger": "event"}
+                if now - last < EVENT_SCRIPT_COOLDOWN_SECONDS:
+                    # Queueing policies keep it for when the cooldown ends
+                    if s.queue_policy != "drop":
+                        ready_at = last + EVENT_SCRIPT_COOLDOWN_SECONDS
+                        self.queue.offer(s, PendingRun(payload, "event", f"event={ev_type}", ready_at=ready_at))
+                    continue
+
+                if self.trigger(s, payload=payload, label="event", detail=f"event={ev_type}"):
+                    self.event_cooldown[ck] = now
+
+    def dispatch_failures(self) -> None:
+        failures = []
+        while not self.failed_runs.empty():
+            failures.append(self.failed_runs.get_nowait())
+        if self.tailing:
+            for event in self.tailer.poll():
+                if event.get("ok") is not True and event.get("run_id") not in self.local_run_ids:
+                    failures.append(event)
+
+        for event in failures:
+            failed_script_id = event.get("script_id")
+            if not failed_script_id:
+                continue
+
+            for s in self.index.failure_handlers(failed_script_id):
+                self.trigger(
+                    s,
+                    payload={"failed_event": event, "trigger": "on_failure"},
+                    label="on_failure",
+                    detail=f"failure from {failed_script_id}",
+                )
+
+    def run_due(self, now: float) -> None:
+        for sid in self.deadlines.pop_due(now):
+            s = self.scripts.get(sid)
+            if s is None:
+                continue
+
+            is_due, _ = due_to_run(s, self.sched_state, now)
+            if not is_due:
+                # Clock edge (rounding, DST): never spin on a deadline due_to_run disagrees with
+                nd = next_due_at(s, self.sched_state, now)
+                self.deadlines.set_deadline(sid, None if nd is None else max(nd, now + 1.0))
+                continue
+
+            if self.busy(sid):
+                self.deferred.add(sid)
+                continue
+
+            mark_fired(s, self.sched_state, now)
+            self.sched_dirty = True
+            self.deadlines.reschedule(s, self.sched_state, now)
+
+            stype = s.schedule.get("type")
+            self.trigger(
+                s,
+                payload={"scheduled": True, "trigger": stype},
+                label=stype,
+            )
+
+        if self.sched_dirty:
+            self.sched_dirty = False
+            save_state(self.sched_state)
+
+    def poll_file_watches(self, now: float) -> None:
+        for sid, changed in self.watcher.changed(now).items():
+            s = self.scripts.get(sid)
+            if s is None:
+                continue
+
+            self.trigger(
+                s,
+                payload={"trigger": "file_watch", "path": str(_abs_path(s.schedule["path"])), "changed": changed},
+                label="file_watch",
+                detail=f"{len(changed)} changed" if len(changed) > 1 else "",
+            )
+
+    @property
+    def watch_fd(self) -> Optional[int]:
+        """
+        Readable when a watched file changes (inotify); None when watches are polled.
+        """
+
+        return self.watcher.fileno()
+
+    def next_wake(self, now: float, poll_interval: float) -> float:
+        """
+        Earliest deadline, or the next poll tick if anything needs polling.
+        """
+
+        wake_at = now + (poll_interval if self.needs_poll else REGISTRY_RECHECK_SECONDS)
+        for t in (self.deadlines.next_deadline(), self.watcher.next_poll_at(), self.queue.next_ready_at(self.running.union(self.waiting))):
+            if t is not None:
+                wake_at = min(wake_at, t)
+        return wake_at
+
+    def close(self) -> None:
+        save_state(self.sched_state)
+        if self.source_stats:
+            save_source_stats(self.source_stats)
+        self._unsubscribe()
+        self.tailer.close()
+        self.watcher.close()
+        log_writer.flush()
+
+def main(
+    poll_interval: float = 0.5,
+    max_workers: int = 8,
+    exec_mode: str = "cold",
+    max_running: Optional[int] = None,
+    class_limits: Optional[Dict[str, int]] = None,
+) -> int:
+    """
+    Threaded runtime: one loop thread drives DaemonCore, runs execute on a RunExecutor.
+    See make_backend for exec_mode. At most max_running (default: max_workers) runs
+    are admitted at once, so waiting runs are ordered by priority rather than by the pool.
+    """
+
     print("Control Core daemon starting...(Ctrl+C to stop)")
-    write_pid()
 
     stop_flag = {"stop": False}
 
+    # Sleeps until the next deadline; runs finishing and signals wake it early
+    waker = Waker()
+
     def _handle_term(signum, frame):
         stop_flag["stop"] = True
+        waker.wake()
+
+    def _handle_wake(signum, frame):
+        waker.wake()
 
     signal.signal(signal.SIGTERM, _handle_term)
     signal.signal(signal.SIGINT, _handle_term)
+    signal.signal(signal.SIGUSR1, _handle_wake)
 
-    # Persistent scheduler state for interval triggers
-    sched_state: Dict[str, dict] = load_state()
+    # Only once SIGUSR1 is handled: enable/disable signal whatever pid is in the file
+    write_pid()
 
-    # File watches: last seen mtime
-    last_mtime: Dict[str, float] = {}
+    pool = make_backend(exec_mode, max_workers)
+    if pool is not None:
+        set_backend(pool)
 
-    # File watch polling throttle
-    next_poll: Dict[str, float] = {}
-    
-    # Prevent re-entrant runs in this process
-    running: Set[str] = set()
+    # Runs execute off the loop; running tracks in-flight script ids
+    executor = RunExecutor(max_workers=max_workers, wake=waker.wake)
+    core = DaemonCore(executor.submit, executor.running, waker.wake)
+    core.max_running = min(max_running or max_workers, max_workers)
+    core.class_limits = dict(class_limits or {})
 
-    # Log-follow state
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    LOG_PATH.touch(exist_ok=True)
-    log_pos = LOG_PATH.stat().st_size
+    # One thread per wanted event source, each at its own cadence
+    for err in load_plugins():
+        print(f"Event source plugin failed to load: {err}")
+    core.source_factories = source_factories()
+    threads: Dict[str, SourceThread] = {}
 
     try:
-
-        # Event detector state
-        last_ip = get_local_ip()
-        last_net_up = last_ip is not None
-        last_net_change_ts = 0.0
-        last_apps = list_running_apps_macos()
-        idle_fired: Dict[str, bool] = {}
-
-        IDLE_RESET_SECONDS = 3.0
-
-        event_cooldown: Dict[tuple[str, str], float] = {}
-        EVENT_SCRIPT_COOLDOWN_SECONDS = 2.0
-
-        app_event_cooldown: dict[tuple[str, str], float] = {}
-        APP_EVENT_COOLDOWN_SECONDS = 5.0
-
-        APP_POLL_SECONDS = 1.5
-        next_app_poll = 0.0
-
         while not stop_flag["stop"]:
-            now = time.time()
-            scripts = discover_scripts()
-            events = []
-                
-            # Idle detection
-            idle_seconds = get_idle_seconds_macos()
-
-            if idle_seconds is not None and idle_seconds < IDLE_RESET_SECONDS:
-                idle_fired.clear()
-
-            # App open/close 
-            if now >= next_app_poll:
-                next_app_poll = now + APP_POLL_SECONDS
-
-                cur_apps = list_running_apps_macos()
-                opened = sorted(cur_apps - last_apps)
-                closed = sorted(last_apps - cur_apps)
-                last_apps = cur_apps
-
-            for name in opened:
-                k = ("app_open", name)
-                last = app_event_cooldown.get(k, 0.0)
-                if now - last >= APP_EVENT_COOLDOWN_SECONDS:
-                    app_event_cooldown[k] = now
-                    events.append({"type": "app_open", "app": normalize_app_name(name)})
-            
-            for name in closed:
-                k = ("app_close", name)
-                last = app_event_cooldown.get(k, 0.0)
-                if now - last >= APP_EVENT_COOLDOWN_SECONDS:
-                    app_event_cooldown[k] = now
-                    events.append({"type": "app_close", "app": normalize_app_name(name)})
-            
-            # Network up/down
-            ip = get_local_ip()
-            net_up = ip is not None
-            if net_up != last_net_up:
-                if now - last_net_change_ts >= 2.0:
-                    last_net_change_ts = now
-                    last_net_up = net_up
-                    if net_up:
-                        events.append({"type": "network_up", "ip": ip})
-                    else:
-                        events.append({"type": "network_down"})
-            
-            # Dispatch idle
-            for sid, s in scripts.items():
-                if not s.enabled:
-                    continue
-                sched = s.schedule or {}
-                if sched.get("type") != "event":
-                    continue
-
-                wants = sched.get("events")
-                if not (isinstance(wants, list) and wants):
-                    continue
-
-                if "idle" not in wants:
-                    continue
-                
-                if idle_seconds is None:
-                        continue
-                try:
-                    threshold = float(sched.get("seconds", 0))
-                except Exception:
-                    continue
-                if idle_seconds < threshold:
-                    continue
-                if idle_fired.get(sid):
-                    continue
+            completions = executor.drain()
+            _report(completions)
 
-                idle_fired[sid] = True
-                if sid in running:
-                    continue
-            
-                running.add(sid)
-                try:
-                    ok, run_id = run_script(
-                        s,
-                        timeout_seconds=20.0,
-                        payload={"event": {"type": "idle", "idle_seconds": idle_seconds}, "trigger": "event"},
-                    )
-                    print(f"[{time.strftime('%H:%M:%S')}] event -> ran {sid} ok={ok} run_id={run_id} (event=idle)")
-                finally:
-                    running.remove(sid)
-
-            # Dispatch other discrete events
-            for ev in events:
-                ev_type = ev.get("type")
-                if not isinstance(ev_type, str):
-                    continue
-
-                for sid, s in scripts.items():
-                    if not s.enabled:
-                        continue
-
-                    sched = s.schedule or {}
-                    if sched.get("type") != "event":
-                        continue
-
-                    wants = sched.get("events")
-                    if not (isinstance(wants, list) and wants):
-                        continue
-
-                    if ev_type not in wants:
-                        continue
-                    
-                    # Script cooldown per (sid, want)
-                    ck = (sid, ev_type)
-                    last = event_cooldown.get(ck, 0.0)
-                    if now - last < EVENT_SCRIPT_COOLDOWN_SECONDS:
-                        continue
-
-                    # App filtering 
-                    if ev_type in ("app_open", "app_close"):
-                        apps = sched.get("apps")
-                        if not match_apps(apps if isinstance(apps, list) else None, ev.get("app", "")):
-                            continue
-                    
-                    if sid in running:
-                        continue
-
-                    event_cooldown[ck] = now
-                    running.add(sid)
-                    try:
-                        ok, run_id = run_script(
-                            s,
-                            timeout_seconds=20.0,
-                            payload={"event": ev, "trigger": "event"},
-                        )
-                        print(f"[{time.strftime('%H:%M:%S')}] event -> ran {sid} ok={ok} run_id={run_id} (event={ev_type})")
-                    finally:
-                        running.remove(sid)
-                        
-            # Purge state for disabled/missing scripts
-            enabled_ids = {sid for sid, s in scripts.items() if s.enabled}
-            for sid in list(last_mtime.keys()):
-                if sid not in enabled_ids:
-                    last_mtime.pop(sid, None)
-            
-            for sid in list(next_poll.keys()):
-                if sid not in enabled_ids:
-                    next_poll.pop(sid, None)
-            
-            for sid in list(sched_state.keys()):
-                if sid not in enabled_ids:
-                    sched_state.pop(sid, None)
-
-            try:
-                size = LOG_PATH.stat().st_size
-                if size < log_pos:
-                    log_pos = 0
-            except FileNotFoundError:
-                log_pos = 0 # 
-
-            try:
-                with LOG_PATH.open("r", encoding="utf-8") as f:
-                    f.seek(log_pos)
-                    new = f.read()
-                    log_pos = f.tell()
-            
-            except FileNotFoundError:
-                new = ""
-            
-            if new:
-                for line in new.splitlines():
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        event = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
-
-                    if event.get("ok") is True:
-                        continue
-
-                    failed_script_id = event.get("script_id")
-                    if not failed_script_id:
-                        continue
-
-                    # Find all enabled on_failure scripts and run those matching the target
-                    for sid, s in scripts.items():
-                        sched = s.schedule or {}
-                        if not s.enabled or sched.get("type") != "on_failure":
-                            continue
-                        
-                        if failed_script_id == sid:
-                            continue 
-
-                        target = sched.get("target", "*")
-                        if target != "*" and target != failed_script_id:
-                            continue
-
-                        if sid in running:
-                            continue
-
-                        running.add(sid)
-                        try:
-                            ok, run_id = run_script(
-                                s,
-                                timeout_seconds=20.0,
-                                payload={"failed_event": event, "trigger": "on_failure"},
-                            )
-                            print(
-                                f"[{time.strftime('%H:%M:%S')}] on_failure -> ran {sid} ok={ok} run_id={run_id} (failure from {failed_script_id})"
-                            )
-                        finally:
-                            running.remove(sid)
-
-            any_sched_change = False
-
-            # Run due scripts
-            for sid, s in scripts.items():
-                if not s.enabled:
-                    continue
-
-                sched = s.schedule or {}
-                stype = sched.get("type")
-
-                if stype in ("interval", "time"):
-                    is_due, interval = due_to_run(s, sched_state, now)
-                    if not is_due:
-                        continue
-
-                    if sid in running:
-                        continue
-
-                    mark_fired(s, sched_state, now)
-                    any_sched_change = True
-
-                    running.add(sid)
-                    try:
-                        ok, run_id = run_script(
-                            s,
-                            timeout_seconds=20.0,
-                            payload={"scheduled": True, "trigger": stype},
-                        )
-                        print(f"[{time.strftime('%H:%M:%S')}] ran {sid} ok={ok} run_id={run_id}")
-                    finally:
-                        running.remove(sid)
-                
-                elif stype == "file_watch":
-                    p = sched.get("path")
-                    if not p:
-                        continue
-                    watched = _abs_path(p)
-                    poll_seconds = float(sched.get("poll_seconds", 1.0) or 1.0)
-
-                    # Throttle polling per script
-                    due = next_poll.get(sid, 0.0)
-                    if now < due:
-                        continue
-                    next_poll[sid] = now + poll_seconds
-
-                    m = watched.stat().st_mtime if watched.exists() else 0.0
-                    prev = last_mtime.get(sid)
-                    if prev is None:
-                        last_mtime[sid] = m
-                        continue
-                        
-                    if m != prev:
-                        last_mtime[sid] = m
-
-                        if sid in running:
-                            continue
-
-                        running.add(sid)
-                        try:
-                            ok, run_id = run_script(
-                                s,
-                                timeout_seconds=20.0,
-                                payload={"trigger": "file_watch", "path": str(watched)},
-                            )
-                            print(f"[{time.strftime('%H:%M:%S')}] file_watch -> ran {sid} ok={ok} run_id={run_id}")
-                        finally:
-                            running.remove(sid)
-            
-                else:
-                    continue
-                
-            if any_sched_change:
-                save_state(sched_state)
-            
-            time.sleep(poll_interval)
+            now = time.time()
+            core.refresh(now)
+            for c in completions:
+                core.run_finished(c.script_id, now, c.run_id)
+
+            if core.wanted_sources != threads.keys():
+                for name in threads.keys() - core.wanted_sources:
+                    threads.pop(name).stop()
+                for name in core.wanted_sources - threads.keys():
+                    t = threads[name] = SourceThread(core.new_source(name), core.events, core.source_stats[name])
+                    t.start()
+
+            core.handle_events(core.events.drain(), now)
+            core.dispatch_failures()
+            core.run_due(now)
+            core.poll_file_watches(now)
+            core.run_pending(now)
+
+            watch_fd = core.watch_fd
+            waker.wait(core.next_wake(now, poll_interval) - time.time(), () if watch_fd is None else (watch_fd,))
 
         return 0
         
     finally:
-        save_state(sched_state)
+        for t in threads.values():
+            t.stop()
+
+        # Let in-flight runs finish so their results are logged
+        _report(executor.shutdown(wait=True))
+        if pool is not None:
+            set_backend(None)
+            pool.close()
+        core.close()
+        waker.close()
         clear_pid()
 
 if __name__ == "__main__":
+    import sys
+
+    argv = sys.argv[1:]
+    kwargs = {}
+    if "--exec-mode" in argv:
+        i = argv.index("--exec-mode")
+        if i + 1 >= len(argv) or argv[i + 1] not in ("cold", "warm", "zygote"):
+            print(
+                "Usage: python -m control_core.daemon [--exec-mode cold|warm|zygote] [--workers N] "
+                "[--max-running N] [--class-limits class=N,...] [--asyncio]"
+            )
+            raise SystemExit(2)
+        kwargs["exec_mode"] = argv[i + 1]
+    if "--workers" in argv:
+        i = argv.index("--workers")
+        try:
+            kwargs["max_workers"] = max(1, int(argv[i + 1]))
+        except (IndexError, ValueError):
+            print("--workers must be an integer")
+            raise SystemExit(2)
+    if "--max-running" in argv:
+        i = argv.index("--max-running")
+        try:
+            kwargs["max_running"] = max(1, int(argv[i + 1]))
+        except (IndexError, ValueError):
+            print("--max-running must be an integer")
+            raise SystemExit(2)
+    if "--class-limits" in argv:
+        i = argv.index("--class-limits")
+        try:
+            kwargs["class_limits"] = parse_class_limits(argv[i + 1])
+        except (IndexError, ValueError):
+            print("--class-limits must look like batch=2,default=4")
+            raise SystemExit(2)
+
     code = 0
     try:
-        code = main()
+        if "--asyncio" in argv:
+            from .async_daemon import main as async_main
+            code = async_main(**kwargs)
+        else:
+            code = main(**kwargs)
         print("Daemon exiting")
     except KeyboardInterrupt:
         print("\nDaemon stopped.")
-    raise SystemExit(code)
\ No newline at end of file
+    raise SystemExit(code)
@@ -1,4 +1,6 @@
 import os 
+import errno
+import fcntl
 import signal
 from pathlib import Path
 from typing import Optional
@@ -7,9 +9,42 @@ PID_PATH = Path(__file__).resolve().parent.parent / "data" / "daemon.pid"
 
 LOCKS_DIR = Path(__file__).resolve().parent.parent / "data" / "locks"
 
+# The running daemon holds a flock on its pid file, so a pid left behind by one that
+# died (and since reused by an unrelated process) is never signalled
+_pid_fd: Optional[int] = None
+
 def write_pid() -> None:
+    global _pid_fd
     PID_PATH.parent.mkdir(parents=True, exist_ok=True)
-    PID_PATH.write_text(str(os.getpid()), encoding="utf-8")
+    fd = os.open(PID_PATH, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        # Another daemon holds it; record our pid anyway, as before
+        os.close(fd)
+        PID_PATH.write_text(str(os.getpid()), encoding="utf-8")
+        return
+    data = str(os.getpid()).encode("utf-8")
+    os.pwrite(fd, data, 0)
+    os.ftruncate(fd, len(data))
+    _pid_fd = fd
+
+def daemon_pid_locked() -> bool:
+    """
+    Whether a live daemon holds the pid file (see write_pid).
+    """
+
+    try:
+        fd = os.open(PID_PATH, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except OSError as e:
+        return e.errno in (errno.EAGAIN, errno.EACCES)
+    finally:
+        os.close(fd)
 
 def read_pid() -> Optional[int]:
     if not PID_PATH.exists():
@@ -20,11 +55,15 @@ def read_pid() -> Optional[int]:
         return None
     
 def clear_pid() -> None:
+    global _pid_fd
     try:
         PID_PATH.unlink(missing_ok=True)
     except TypeError:
         if PID_PATH.exists():
             PID_PATH.unlink()
+    if _pid_fd is not None:
+        os.close(_pid_fd)
+        _pid_fd = None
 
 def pid_is_running(pid: int) -> bool:
     """
@@ -40,4 +79,19 @@ def pid_is_running(pid: int) -> bool:
         return True
 
 def stop_pid(pid: int) -> None:
-    os.kill(pid, signal.SIGTERM)
\ No newline at end of file
+    os.kill(pid, signal.SIGTERM)
+
+def wake_daemon() -> None:
+    """
+    Best-effort SIGUSR1 to a running daemon so it rechecks manifests immediately.
+    Only sent while the daemon holds its pid file lock; otherwise the pid may be stale
+    (and reused by another process), and the daemon notices within its recheck interval.
+    """
+
+    pid = read_pid()
+    if pid is None or pid == os.getpid() or not daemon_pid_locked():
+        return
+    try:
+        os.kill(pid, signal.SIGUSR1)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -1,53 +1,63 @@
 from __future__ import annotations
+import asyncio
 import subprocess
 import time
 import socket
 from typing import Optional, Set, Dict, Any, List
 
-def list_running_apps_macos() -> set[str]:
+OSASCRIPT_APPS_CMD = ["osascript", "-e", 'tell application "System Events" to get name of application processes']
+IOREG_IDLE_CMD = ["ioreg", "-c", "IOHIDSystem"]
+
+def _parse_app_names(out: str) -> set[str]:
+    apps = set()
+    for part in out.split(","):
+        name = part.strip()
+        if name:
+            apps.add(name)
+    return apps
+
+def _parse_idle_seconds(out: str) -> Optional[float]:
+    for line in out.splitlines():
+        if "HIDIdleTime" in line:
+            parts = line.strip().split()
+            for token in reversed(parts):
+                if token.isdigit():
+                    ns = int(token)
+                    return ns / 1e9
+    return None
+
+def list_running_apps_macos(timeout: Optional[float] = None) -> set[str]:
     """
     Returns a set of GUI app process names
     """
 
     try:
         out = subprocess.check_output(
-            ["osascript", "-e", 'tell application "System Events" to get name of application processes'],
+            OSASCRIPT_APPS_CMD,
             text=True,
             stderr=subprocess.DEVNULL,
+            timeout=timeout,
         )
-
-        apps = set()
-        for part in out.split(","):
-            name = part.strip()
-            if name:
-                apps.add(name)
-        return apps
+        return _parse_app_names(out)
     except Exception:
         return set()
     
-def get_idle_seconds_macos() -> Optional[float]:
+def get_idle_seconds_macos(timeout: Optional[float] = None) -> Optional[float]:
     """
     Returns idle seconds, or None if unsupported
     """
     try:
         out = subprocess.check_output(
-            ["ioreg", "-c", "IOHIDSystem"],
+            IOREG_IDLE_CMD,
             text=True,
             stderr=subprocess.DEVNULL,
+            timeout=timeout,
         )
-
-        for line in out.splitlines():
-            if "HIDIdleTime" in line:
-                parts = line.strip().split()
-                for token in reversed(parts):
-                    if token.isdigit():
-                        ns = int(token)
-                        return ns / 1e9
-        return None
+        return _parse_idle_seconds(out)
     except Exception:
         return None
     
-def get_local_ip() -> Optional[str]:
+def get_local_ip(timeout: float = 1.0) -> Optional[str]:
     """
     Returns local IP used for default route, or None if network seems down.
     """
@@ -55,7 +65,7 @@ def get_local_ip() -> Optional[str]:
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
-            s.settimeout(1.0)
+            s.settimeout(timeout)
             s.connect(("8.8.8.8", 53))
             return s.getsockname()[0]
         finally:
@@ -63,6 +73,48 @@ def get_local_ip() -> Optional[str]:
     except Exception:
         return None
 
+async def _check_output_async(cmd: List[str], timeout: float) -> Optional[str]:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+    except Exception:
+        return None
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None
+    if proc.returncode != 0:
+        return None
+    return out.decode("utf-8", errors="replace")
+
+async def list_running_apps_macos_async(timeout: float = 5.0) -> set[str]:
+    out = await _check_output_async(OSASCRIPT_APPS_CMD, timeout)
+    return _parse_app_names(out) if out is not None else set()
+
+async def get_idle_seconds_macos_async(timeout: float = 5.0) -> Optional[float]:
+    out = await _check_output_async(IOREG_IDLE_CMD, timeout)
+    return _parse_idle_seconds(out) if out is not None else None
+
+async def get_local_ip_async(timeout: float = 1.0) -> Optional[str]:
+    """
+    get_local_ip on a non-blocking socket driven by the running loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.setblocking(False)
+            await asyncio.wait_for(loop.sock_connect(s, ("8.8.8.8", 53)), timeout)
+            return s.getsockname()[0]
+        finally:
+            s.close()
+    except Exception:
+        return None
+
 def match_apps(event_apps: Optional[List[str]], app_name: str) -> bool:
     """
     If event_apps is None/empty => match any app.
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set
+
+from .registry import Script
+from .runner import run_script
+
+@dataclass
+class Completion:
+    script_id: str
+    label: str
+    detail: str
+    ok: bool
+    run_id: Optional[str]
+    error: Optional[BaseException] = None
+
+class RunExecutor:
+    """
+    Runs scripts on a bounded thread pool so the daemon loop never blocks on a run.
+    `running` holds the ids of in-flight scripts; finished runs are collected with drain().
+    Only the daemon thread should call submit()/drain(); `wake` is called from the
+    worker thread whenever a run finishes.
+    """
+
+    def __init__(self, max_workers: int = 8, wake: Optional[Callable[[], None]] = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="control-core-run")
+        self._done: "queue.SimpleQueue[Completion]" = queue.SimpleQueue()
+        self._wake = wake
+        self.running: Set[str] = set()
+
+    def submit(
+        self,
+        script: Script,
+        payload: dict,
+        label: str,
+        detail: str = "",
+        timeout_seconds: Optional[float] = 20.0,
+        queue_meta: Optional[dict] = None,
+    ) -> bool:
+        """
+        Returns False if the script already has a run in flight.
+        """
+
+        if script.id in self.running:
+            return False
+
+        self.running.add(script.id)
+        fut = self._pool.submit(run_script, script, timeout_seconds=timeout_seconds, payload=payload, queue_meta=queue_meta)
+
+        def _on_done(f: Future) -> None:
+            err = None if f.cancelled() else f.exception()
+            if err is None and not f.cancelled():
+                ok, run_id = f.result()
+            else:
+                ok, run_id = False, None
+            self._done.put(Completion(script.id, label, detail, ok, run_id, err))
+            if self._wake is not None:
+                self._wake()
+
+        fut.add_done_callback(_on_done)
+        return True
+
+    def drain(self) -> List[Completion]:
+        out: List[Completion] = []
+        while True:
+            try:
+                c = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self.running.discard(c.script_id)
+            out.append(c)
+        return out
+
+    def shutdown(self, wait: bool = True) -> List[Completion]:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        return self.drain()
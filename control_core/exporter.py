@@ -1,23 +1,10 @@
 import csv
 import json
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Optional
 
-LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
-
-def _iter_events() -> Iterable[dict]:
-    if not LOG_PATH.exists():
-        return []
-    
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+from .log_rotate import iter_records
+from .runstore import open_store
 
 def export_csv(output_path: str, max_rows: Optional[int] = None) -> Path:
     out = Path(output_path).expanduser().resolve()
@@ -46,7 +33,8 @@ def export_csv(output_path: str, max_rows: Optional[int] = None) -> Path:
         w = csv.DictWriter(f, fieldnames=fieldnames)
         w.writeheader()
 
-        for e in _iter_events():
+        store = open_store()
+        for e in store.iter_all() if store is not None else iter_records():
             started = e.get("started_at")
             ended = e.get("ended_at")
             duration_ms = ""
@@ -0,0 +1,487 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import hashlib
+import os
+import stat
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# Watches are placed on the parent directory so atomic replace (write + rename) and re-creation are seen
+DIR_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+
+class Inotify:
+    """
+    Minimal ctypes binding for inotify. The fd is non-blocking; read_events() returns
+    [] when nothing is queued.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.fd = fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), str(path))
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        """
+        [(wd, mask, name)] for everything currently queued.
+        """
+
+        out: List[Tuple[int, int, str]] = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return out
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if not data:
+                return out
+
+            pos = 0
+            while pos + _EVENT.size <= len(data):
+                wd, mask, _, name_len = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos + name_len].split(b"\0", 1)[0]
+                pos += name_len
+                out.append((wd, mask, os.fsdecode(name)))
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def open_inotify() -> Optional[Inotify]:
+    """
+    None when inotify is unavailable (not Linux, no libc symbol, fd limit reached)
+    or disabled with CONTROL_CORE_FILE_WATCH=poll.
+    """
+
+    if not sys.platform.startswith("linux") or os.environ.get("CONTROL_CORE_FILE_WATCH") == "poll":
+        return None
+    try:
+        return Inotify()
+    except (OSError, AttributeError):
+        return None
+
+# (mtime_ns, size) of a watched file; None when it doesn't exist
+Sig = Optional[Tuple[int, int]]
+
+def _sig(path: str, regular_only: bool = False) -> Sig:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if regular_only and not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def content_digest(path: str, chunk_size: int = 1024 * 1024) -> Optional[Tuple[int, str]]:
+    """
+    (size, blake2b hex digest) of a file's content; None when it can't be read.
+    """
+
+    h = hashlib.blake2b(digest_size=16)
+    size = 0
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                h.update(chunk)
+    except OSError:
+        return None
+    return size, h.hexdigest()
+
+def _has_magic(s: str) -> bool:
+    return any(c in s for c in "*?[")
+
+def watch_key(path: str) -> Tuple[str, Path, Optional[str]]:
+    """
+    (kind, resolved path, pattern) for a file_watch path:
+    "glob" when the last component has wildcards (data/inbox/*.csv), "dir" for a
+    directory (or a path written with a trailing slash), "file" otherwise.
+    """
+
+    raw = os.fspath(path)
+    if _has_magic(os.path.basename(raw)):
+        return "glob", Path(os.path.dirname(raw)).resolve(), os.path.basename(raw)
+    if raw.endswith(os.sep) or os.path.isdir(raw):
+        return "dir", Path(raw).resolve(), None
+    return "file", Path(raw).resolve(), None
+
+class _Watch:
+    """
+    One watched path, shared by every script that watches it.
+    """
+
+    __slots__ = ("kind", "path", "pattern", "subscribers", "snapshot", "dirty", "wd_dir", "next_poll")
+
+    def __init__(self, kind: str, path: Path, pattern: Optional[str]):
+        self.kind = kind
+        self.path = path
+        self.pattern = pattern
+        self.subscribers: Dict[str, WatchSpec] = {}
+
+        # file: Sig; dir/glob: {name: Sig}
+        self.snapshot = None
+
+        # inotify: names reported since the last check (None = rescan everything)
+        self.dirty: Optional[Set[str]] = set()
+        self.wd_dir: Optional[Path] = None
+        self.next_poll: Optional[float] = None
+
+    @property
+    def poll_dir(self) -> Path:
+        return self.path.parent if self.kind == "file" else self.path
+
+    @property
+    def poll_seconds(self) -> float:
+        return min((spec.poll_seconds for spec in self.subscribers.values()), default=1.0)
+
+    def matches(self, name: str) -> bool:
+        if self.kind == "file":
+            return name == self.path.name
+        return self.pattern is None or fnmatch.fnmatchcase(name, self.pattern)
+
+    def scan(self) -> Dict[str, Sig]:
+        """
+        Full listing of a dir/glob watch: one scandir, stat only for matching regular files.
+        """
+
+        out: Dict[str, Sig] = {}
+        try:
+            it = os.scandir(self.path)
+        except OSError:
+            return out
+        with it:
+            for e in it:
+                if not self.matches(e.name):
+                    continue
+                try:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                out[e.name] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def prime(self) -> None:
+        self.snapshot = _sig(str(self.path)) if self.kind == "file" else self.scan()
+
+    def check(self) -> Dict[str, Sig]:
+        """
+        Paths that changed since the last check (created, modified or deleted) -> new Sig.
+        """
+
+        dirty, self.dirty = self.dirty, set()
+        if self.kind == "file":
+            sig = _sig(str(self.path))
+            if sig == self.snapshot:
+                return {}
+            self.snapshot = sig
+            return {str(self.path): sig}
+
+        snap: Dict[str, Sig] = self.snapshot
+        changed: Dict[str, Sig] = {}
+        if dirty is None:
+            new = self.scan()
+            for n in sorted(set(snap) | set(new)):
+                if snap.get(n) != new.get(n):
+                    changed[n] = new.get(n)
+            self.snapshot = new
+        else:
+            # Only the entries inotify named are restatted
+            for name in sorted(dirty):
+                sig = _sig(os.path.join(self.path, name), regular_only=True)
+                if sig == snap.get(name):
+                    continue
+                if sig is None:
+                    snap.pop(name, None)
+                else:
+                    snap[name] = sig
+                changed[name] = sig
+        return {str(self.path / n): sig for n, sig in changed.items()}
+
+@dataclass(frozen=True)
+class WatchSpec:
+    """
+    One script's file_watch subscription (see registry._normalize_schedule).
+    """
+
+    path: str
+    poll_seconds: float = 1.0
+    settle_seconds: float = 0.0
+    content_hash: bool = False
+
+@dataclass
+class _Pending:
+    # Changed path -> Sig when last seen; fires once nothing moved for settle_seconds
+    paths: Dict[str, Sig] = field(default_factory=dict)
+    due: float = 0.0
+
+WatchKey = Tuple[str, Path, Optional[str]]
+
+class FileWatcher:
+    """
+    Shared watch table for file_watch scripts.
+    Watches are keyed on (kind, resolved path, pattern), so scripts watching the same
+    path share one entry: a single stat (or scandir) per change, fanned out to every
+    subscriber. Directory and glob watches diff a name -> (mtime_ns, size) snapshot.
+
+    With inotify, the directory holding each watch is watched and only the entries an
+    event names are restatted, so idle paths cost nothing and fileno() becomes readable
+    as soon as something changes. Watches whose directory can't be watched (missing,
+    inotify unavailable or out of watches) are polled at their subscribers' smallest
+    poll_seconds and hand over to inotify once the directory appears.
+    """
+
+    def __init__(self):
+        self._inotify = open_inotify()
+        self._watches: Dict[WatchKey, _Watch] = {}
+
+        # sid -> subscription, watch key
+        self._specs: Dict[str, WatchSpec] = {}
+        self._by_sid: Dict[str, WatchKey] = {}
+
+        # Settle windows in progress, last delivered content digests (content_hash subscribers)
+        self._pending: Dict[str, _Pending] = {}
+        self._digests: Dict[str, Dict[str, Optional[Tuple[int, str]]]] = {}
+
+        # inotify: wd <-> directory, directory -> watches living in it
+        self._wd_dir: Dict[int, Path] = {}
+        self._dir_wd: Dict[Path, int] = {}
+        self._in_dir: Dict[Path, List[_Watch]] = {}
+
+    @property
+    def using_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def fileno(self) -> Optional[int]:
+        return self._inotify.fd if self._inotify is not None else None
+
+    def set_watches(self, watches: Dict[str, WatchSpec]) -> None:
+        """
+        Replace the subscriptions (sid -> WatchSpec).
+        Paths that stay watched keep their snapshot, so re-subscribing never fires.
+        """
+
+        by_sid = {sid: watch_key(spec.path) for sid, spec in watches.items()}
+        for sid, key in self._by_sid.items():
+            if by_sid.get(sid) != key:
+                self._watches[key].subscribers.pop(sid, None)
+            if watches.get(sid) != self._specs.get(sid):
+                self._pending.pop(sid, None)
+                self._digests.pop(sid, None)
+
+        for sid, key in by_sid.items():
+            spec = watches[sid]
+            w = self._watches.get(key)
+            if w is None:
+                w = self._watches[key] = _Watch(*key)
+                w.prime()
+                if not self._attach(w):
+                    w.next_poll = 0.0
+            w.subscribers[sid] = spec
+
+            # A single file's baseline content, so the first bare touch is recognised too
+            if spec.content_hash and sid not in self._digests:
+                self._digests[sid] = {str(w.path): content_digest(str(w.path))} if w.kind == "file" else {}
+        self._by_sid = by_sid
+        self._specs = dict(watches)
+
+        for key in [k for k, w in self._watches.items() if not w.subscribers]:
+            self._detach(self._watches.pop(key))
+
+    def _attach(self, w: _Watch) -> bool:
+        if self._inotify is None:
+            return False
+        d = w.poll_dir
+        if d not in self._dir_wd:
+            try:
+                wd = self._inotify.add_watch(d, DIR_MASK)
+            except OSError:
+                return False
+            self._dir_wd[d] = wd
+            self._wd_dir[wd] = d
+        self._in_dir.setdefault(d, []).append(w)
+        w.wd_dir = d
+        w.next_poll = None
+        return True
+
+    def _detach(self, w: _Watch) -> None:
+        d = w.wd_dir
+        if d is None:
+            return
+        w.wd_dir = None
+        ws = [x for x in self._in_dir.get(d, []) if x is not w]
+        if ws:
+            self._in_dir[d] = ws
+            return
+        self._in_dir.pop(d, None)
+        wd = self._dir_wd.pop(d, None)
+        if wd is not None:
+            self._wd_dir.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _drop_dir(self, wd: int) -> None:
+        # Directory removed or moved away: its watches go back to polling until it reappears
+        d = self._wd_dir.pop(wd, None)
+        if d is None:
+            return
+        self._dir_wd.pop(d, None)
+        for w in self._in_dir.pop(d, []):
+            w.wd_dir = None
+            w.dirty = None
+            w.next_poll = 0.0
+
+    def _drain_events(self) -> None:
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: rescan everything
+                for w in self._watches.values():
+                    w.dirty = None
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                self._drop_dir(wd)
+                continue
+            d = self._wd_dir.get(wd)
+            if d is None or not name:
+                continue
+            for w in self._in_dir.get(d, ()):
+                if w.dirty is not None and w.matches(name):
+                    w.dirty.add(name)
+
+    def changed(self, now: float) -> Dict[str, List[str]]:
+        """
+        sid -> changed paths, for every subscribed path that changed since the last call.
+        """
+
+        # Even with no directories left: rm_watch queues an IN_IGNORED that must be read,
+        # or the fd stays readable and the daemon's wait never blocks
+        if self._inotify is not None:
+            self._drain_events()
+
+        for w in self._watches.values():
+            if w.next_poll is not None:
+                if now < w.next_poll:
+                    continue
+                if self._attach(w):
+                    # Directory showed up: hand over to inotify after one full check
+                    w.dirty = None
+                else:
+                    w.next_poll = now + w.poll_seconds
+                    w.dirty = None
+            elif w.dirty is not None and not w.dirty:
+                continue
+
+            changed = w.check()
+            if not changed:
+                continue
+            for sid, spec in w.subscribers.items():
+                p = self._pending.setdefault(sid, _Pending())
+                p.paths.update(changed)
+                p.due = now + spec.settle_seconds
+
+        out: Dict[str, List[str]] = {}
+        for sid, p in list(self._pending.items()):
+            if now < p.due:
+                continue
+            spec = self._specs[sid]
+
+            if spec.settle_seconds > 0:
+                # Catch writes the last poll didn't see before calling the path quiet
+                moved = {path: sig for path, old in p.paths.items() if (sig := _sig(path)) != old}
+                if moved:
+                    p.paths.update(moved)
+                    p.due = now + spec.settle_seconds
+                    continue
+
+            del self._pending[sid]
+            paths = sorted(p.paths)
+            if spec.content_hash:
+                paths = self._content_changed(sid, paths)
+            if paths:
+                out[sid] = paths
+        return out
+
+    def _content_changed(self, sid: str, paths: List[str]) -> List[str]:
+        seen = self._digests.setdefault(sid, {})
+        out = []
+        for path in paths:
+            digest = content_digest(path)
+            if path in seen and seen[path] == digest:
+                continue
+            if digest is None:
+                seen.pop(path, None)
+            else:
+                seen[path] = digest
+            out.append(path)
+        return out
+
+    def next_poll_at(self) -> Optional[float]:
+        """
+        When changed() next needs calling for polled watches or settle windows
+        (None if there is nothing to do until inotify reports something).
+        """
+
+        times = [w.next_poll for w in self._watches.values() if w.next_poll is not None]
+        times += [p.due for p in self._pending.values()]
+        return min(times, default=None)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._wd_dir.clear()
+        self._dir_wd.clear()
+        self._in_dir.clear()
+        for w in self._watches.values():
+            w.wd_dir = None
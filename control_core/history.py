@@ -1,40 +1,18 @@
-import json
 import time
-from collections import deque
-from pathlib import Path
-from typing import List, Optional
+from typing import List
 
-LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
-
-def _safe_load(line: str) -> Optional[dict]:
-    try:
-        return json.loads(line)
-    except json.JSONDecodeError:
-        return None
+from .log_rotate import tail_records
+from .runstore import open_store
 
 def get_history(script_id: str, n: int = 20) -> List[dict]:
     """
     Return last n events for a given script_id.
     """
 
-    if not LOG_PATH.exists():
-        return []
-    
-    buf = deque(maxlen=n)
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            e = _safe_load(line)
-            if not e:
-                continue
-
-            if e.get("script_id") == script_id:
-                buf.append(e)
-
-    return list(buf)
+    store = open_store()
+    if store is not None:
+        return store.history(script_id, n)
+    return tail_records(n, lambda e: e.get("script_id") == script_id)
 
 def format_event(e: dict) -> str:
     ended = e.get("ended_at") or e.get("started_at")
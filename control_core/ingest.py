@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import stat
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INGEST_PATH = Path(__file__).resolve().parent.parent / "data" / "events.sock"
+
+# One datagram: a JSON event object, or a list of up to MAX_BATCH of them
+MAX_DATAGRAM = 64 * 1024
+MAX_BATCH = 100
+
+# Datagrams read per poll; the rest wait for the next one so a flood can't pin the source
+MAX_DATAGRAMS_PER_POLL = 256
+
+# Per-sender token bucket (events/second, burst = 2x)
+DEFAULT_RATE = 50.0
+
+# Event types produced internally; the detectors own them
+RESERVED_TYPES = {"idle"}
+
+_TYPE_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.:-]{0,63}")
+
+# struct ucred: pid, uid, gid
+_UCRED = struct.Struct("iII")
+
+def valid_event_type(ev_type) -> bool:
+    return isinstance(ev_type, str) and _TYPE_RE.fullmatch(ev_type) is not None and ev_type not in RESERVED_TYPES
+
+def parse_batch(data: bytes) -> Tuple[List[dict], int]:
+    """
+    (valid events, number rejected) for one datagram. A datagram that isn't JSON, or
+    a batch over MAX_BATCH, is rejected as a whole.
+    """
+
+    try:
+        obj = json.loads(data)
+    except (ValueError, UnicodeDecodeError):
+        return [], 1
+    items = obj if isinstance(obj, list) else [obj]
+    if len(items) > MAX_BATCH:
+        return [], len(items)
+
+    out = [ev for ev in items if isinstance(ev, dict) and valid_event_type(ev.get("type"))]
+    return out, len(items) - len(out)
+
+class RateLimiter:
+    """
+    Token bucket per sender key: `rate` events/second, bursts up to `burst`.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else 2 * rate
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, n: int, now: Optional[float] = None) -> int:
+        """
+        How many of n events the sender may have now (0..n).
+        """
+
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = min(n, int(tokens))
+        self._buckets[key] = (tokens - allowed, now)
+
+        # Forget senders whose bucket has refilled (exited pids, one-shot clients)
+        if len(self._buckets) > 1024:
+            self._buckets = {
+                k: (t, ts) for k, (t, ts) in self._buckets.items()
+                if t + (now - ts) * self.rate < self.burst
+            }
+        return allowed
+
+def _rate_from_env() -> float:
+    try:
+        rate = float(os.environ.get("CONTROL_CORE_INGEST_RATE", DEFAULT_RATE))
+    except ValueError:
+        return DEFAULT_RATE
+    return rate if rate > 0 else DEFAULT_RATE
+
+class IngestSocket:
+    """
+    Unix datagram socket other programs push events to (see send_events).
+    Non-blocking; on Linux each datagram carries the sender's pid/uid (SO_PASSCRED),
+    which is what rate limiting keys on. Elsewhere the key is the sender's bound
+    address, if any. Raises OSError when the path is held by another live daemon.
+    """
+
+    def __init__(self, path: Path = INGEST_PATH):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _remove_stale(path)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self._passcred = hasattr(socket, "SO_PASSCRED")
+            if self._passcred:
+                self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_PASSCRED, 1)
+            self._sock.bind(str(path))
+            os.chmod(path, 0o600)
+            self._sock.setblocking(False)
+            self._ino = os.stat(path).st_ino
+        except OSError:
+            self._sock.close()
+            raise
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def recv(self, limit: int = MAX_DATAGRAMS_PER_POLL) -> List[Tuple[bytes, str, Optional[dict]]]:
+        """
+        Up to `limit` pending datagrams as (data, sender key, {"pid", "uid"} or None).
+        Truncated (oversized) datagrams come back with empty data.
+        """
+
+        out = []
+        ancbufsize = socket.CMSG_SPACE(_UCRED.size) if self._passcred else 0
+        for _ in range(limit):
+            try:
+                data, ancdata, flags, addr = self._sock.recvmsg(MAX_DATAGRAM, ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                break
+            if flags & getattr(socket, "MSG_TRUNC", 0):
+                data = b""
+
+            sender = None
+            for level, kind, cdata in ancdata:
+                if level == socket.SOL_SOCKET and kind == getattr(socket, "SCM_CREDENTIALS", None) and len(cdata) >= _UCRED.size:
+                    pid, uid, _ = _UCRED.unpack_from(cdata)
+                    sender = {"pid": pid, "uid": uid}
+            if sender is not None:
+                key = f"{sender['uid']}:{sender['pid']}"
+            else:
+                key = addr if isinstance(addr, str) and addr else "anonymous"
+            out.append((data, key, sender))
+        return out
+
+    def close(self) -> None:
+        self._sock.close()
+        try:
+            # Only remove the path if it is still ours
+            if os.stat(self.path).st_ino == self._ino:
+                os.unlink(self.path)
+        except OSError:
+            pass
+
+def _remove_stale(path: Path) -> None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise OSError(f"{path} exists and is not a socket")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        probe.connect(str(path))
+    except ConnectionRefusedError:
+        # Left behind by a daemon that didn't shut down cleanly
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"{path} is in use by another process")
+
+def send_events(events: Iterable[dict], path: Path = INGEST_PATH) -> None:
+    """
+    Pushes events to a running daemon in one datagram (split into MAX_BATCH chunks).
+    Raises OSError (FileNotFoundError / ConnectionRefusedError) when no daemon is listening.
+    """
+
+    events = list(events)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.connect(str(path))
+        for i in range(0, len(events), MAX_BATCH):
+            sock.send(json.dumps(events[i:i + MAX_BATCH], separators=(",", ":")).encode("utf-8"))
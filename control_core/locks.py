@@ -1,11 +1,21 @@
 from __future__ import annotations
 
 import os
+import json
 import time
 import errno
 import fcntl
+import threading
+from collections import deque
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from .daemon_state import pid_is_running
+
+# Consecutive in-process handoffs before the flock is released anyway, so other
+# processes waiting on the same group get a turn
+MAX_HANDOFFS = 8
 
 @dataclass
 class LockResult:
@@ -17,6 +27,33 @@ def _sanitize_group(group: str) -> str:
     safe = "".join(ch if ch.isalnum() or ch in ("-", "_", ".") else "_" for ch in group.strip())
     return safe or "default"
 
+def _lock_path(lock_dir: str, group: str) -> str:
+    return os.path.join(lock_dir, f"{_sanitize_group(group)}.lock")
+
+def _write_holder(fd: int, holder: Optional[dict]) -> None:
+    # Holder metadata lives in the lock file itself; writing never touches the flock
+    data = json.dumps({**(holder or {}), "pid": os.getpid(), "acquired_at": time.time()}).encode("utf-8")
+    try:
+        os.pwrite(fd, data, 0)
+        os.ftruncate(fd, len(data))
+    except OSError:
+        pass
+
+def _clear_holder(fd: int) -> None:
+    try:
+        os.ftruncate(fd, 0)
+    except OSError:
+        pass
+
+def _try_flock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError as e:
+        if e.errno not in (errno.EAGAIN, errno.EACCES):
+            raise
+        return False
+
 def acquire_file_lock(
     lock_dir: str,
     group: str,
@@ -28,37 +65,318 @@ def acquire_file_lock(
     Returns (LockResult, fd).
     If acquired=False, fd is None
     Caller needs to close(fd) to release.
+    One-off acquisition on a fresh fd (CLI, other tools); long-running callers should
+    use LockManager. Waits block in flock() on a helper thread rather than polling;
+    poll_interval is ignored and kept for compatibility.
     """
 
     os.makedirs(lock_dir, exist_ok=True)
-
-    group_safe = _sanitize_group(group)
-    path = os.path.join(lock_dir, f"{group_safe}.lock")
-
+    path = _lock_path(lock_dir, group)
     fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
 
-    start = time.time()
-    waited = 0.0 
+    start = time.monotonic()
+    try:
+        if _try_flock(fd):
+            return LockResult(acquired=True, wait_seconds=0.0, path=path), fd
+    except OSError:
+        os.close(fd)
+        raise
+    if timeout_seconds <= 0:
+        os.close(fd)
+        return LockResult(acquired=False, wait_seconds=time.monotonic() - start, path=path), None
+
+    # The helper owns fd from here: on timeout it closes it (dropping the lock) once flock returns
+    state = {"done": False, "ok": False, "abandoned": False}
+    cond = threading.Condition()
 
-    while True:
+    def _wait() -> None:
         try:
-            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-            return LockResult(acquired=True, wait_seconds=waited, path=path), fd
-        except OSError as e:
-            if e.errno not in (errno.EAGAIN, errno.EACCES):
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            ok = True
+        except OSError:
+            ok = False
+        with cond:
+            state["done"], state["ok"] = True, ok
+            if state["abandoned"]:
                 os.close(fd)
-                raise
+            cond.notify_all()
 
-            waited = time.time() - start
-            if waited >= timeout_seconds:
-                os.close(fd)
-                return LockResult(acquired=False, wait_seconds=waited, path=path), None
-            
-            time.sleep(poll_interval)
+    threading.Thread(target=_wait, name=f"flock-{group}", daemon=True).start()
+    with cond:
+        cond.wait_for(lambda: state["done"], timeout_seconds)
+        waited = time.monotonic() - start
+        if state["done"] and state["ok"]:
+            return LockResult(acquired=True, wait_seconds=waited, path=path), fd
+        if state["done"]:
+            os.close(fd)
+        else:
+            state["abandoned"] = True
+    return LockResult(acquired=False, wait_seconds=waited, path=path), None
 
 def release_file_lock(fd: int) -> None:
-    # Releasing: Unlock + close 
+    # Releasing: Unlock + close
     try:
         fcntl.flock(fd, fcntl.LOCK_UN)
     finally:
-        os.close(fd)
\ No newline at end of file
+        os.close(fd)
+
+@dataclass(frozen=True)
+class LockHandle:
+    group: str
+    token: object
+
+class _Group:
+    def __init__(self, path: str):
+        self.path = path
+        self.cond = threading.Condition()
+        self.fd: Optional[int] = None
+
+        # In-process owner (a token) and the FIFO of tokens waiting behind it
+        self.owner: Optional[object] = None
+        self.waiters: Deque[object] = deque()
+        self.handoffs = 0
+
+        # Cross-process state: we hold flock on fd / a helper thread is blocked in flock(fd)
+        self.flocked = False
+        self.flock_waiting = False
+
+    def open(self) -> int:
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        return self.fd
+
+    def stale(self) -> bool:
+        # The lock file was removed or replaced: our fd locks an inode nobody else opens
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.fd).st_ino
+        except OSError:
+            return True
+
+    def drop_fd(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.flocked = False
+
+class LockManager:
+    """
+    Lock groups for a long-running process (the daemon's runs).
+    Each group keeps one open fd to its lock file. Threads of this process queue for a
+    group in FIFO order in memory, and only the head talks to flock(): a free lock costs
+    one non-blocking flock, a contended one a blocking flock() on a helper thread (one
+    per group), so the handoff is immediate instead of the next poll. A waiter that
+    times out abandons the helper's attempt: whoever is next inherits it, and a lock
+    nobody wants anymore is released as soon as it is granted.
+    Releasing with in-process waiters hands the lock straight to the next one (up to
+    MAX_HANDOFFS times in a row before other processes get a chance).
+    """
+
+    def __init__(self, lock_dir: str):
+        self.lock_dir = lock_dir
+        self._groups: Dict[str, _Group] = {}
+        self._mutex = threading.Lock()
+
+    def _group(self, group: str) -> _Group:
+        path = _lock_path(self.lock_dir, group)
+        with self._mutex:
+            g = self._groups.get(path)
+            if g is None:
+                os.makedirs(self.lock_dir, exist_ok=True)
+                g = self._groups[path] = _Group(path)
+            return g
+
+    def acquire(
+        self,
+        group: str,
+        timeout_seconds: float = 0.0,
+        holder: Optional[dict] = None,
+    ) -> tuple[LockResult, Optional[LockHandle]]:
+        """
+        (LockResult, handle); handle is None when the lock wasn't acquired in time.
+        `holder` (e.g. run_id, script_id) is written to the lock file with our pid and
+        the acquisition time, for read_locks().
+        """
+
+        g = self._group(group)
+        start = time.monotonic()
+        deadline = start + max(0.0, timeout_seconds)
+        token = object()
+
+        with g.cond:
+            # In-process: FIFO behind the current owner
+            g.waiters.append(token)
+            while g.owner is not None or g.waiters[0] is not token:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    g.waiters.remove(token)
+                    if g.owner is None and not g.waiters and g.flocked:
+                        # We were handed a lock nobody is left to take
+                        fcntl.flock(g.fd, fcntl.LOCK_UN)
+                        g.flocked = False
+                    g.cond.notify_all()
+                    return LockResult(False, time.monotonic() - start, g.path), None
+                g.cond.wait(remaining)
+            g.waiters.popleft()
+            g.owner = token
+
+            # Cross-process (nothing to do when the previous owner handed it over)
+            handed_over = g.flocked
+            try:
+                while True:
+                    if not g.flocked and not g.flock_waiting:
+                        if _try_flock(g.open()):
+                            g.flocked = True
+                        elif deadline > time.monotonic():
+                            threading.Thread(target=self._flock_blocking, args=(g,), name=f"flock-{group}", daemon=True).start()
+                            g.flock_waiting = True
+
+                    if g.flocked:
+                        if handed_over or not g.stale():
+                            break
+                        g.drop_fd()
+                        continue
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        g.owner = None
+                        g.cond.notify_all()
+                        return LockResult(False, time.monotonic() - start, g.path), None
+                    g.cond.wait(remaining)
+            except (OSError, RuntimeError):
+                # Lock dir gone, EACCES, ENOLCK, no thread to wait on...: fail this acquire,
+                # and leave the group free for the next one to retry from scratch
+                self._abandon(g)
+                return LockResult(False, time.monotonic() - start, g.path), None
+
+            waited = time.monotonic() - start
+            _write_holder(g.fd, holder)
+            return LockResult(True, waited, g.path), LockHandle(g.path, token)
+
+    def _abandon(self, g: _Group) -> None:
+        # Under g.cond, by the owner that failed
+        g.owner = None
+        if not g.flock_waiting:
+            try:
+                if g.flocked:
+                    fcntl.flock(g.fd, fcntl.LOCK_UN)
+                g.drop_fd()
+            except OSError:
+                g.fd = None
+                g.flocked = False
+        g.cond.notify_all()
+
+    def _flock_blocking(self, g: _Group) -> None:
+        fd = g.fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            ok = True
+        except OSError:
+            ok = False
+        with g.cond:
+            g.flock_waiting = False
+            if ok:
+                if g.owner is None and not g.waiters:
+                    # Everyone gave up meanwhile
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    g.flocked = True
+            g.cond.notify_all()
+
+    def release(self, handle: Optional[LockHandle]) -> None:
+        if handle is None:
+            return
+        with self._mutex:
+            g = self._groups.get(handle.group)
+        if g is None:
+            return
+        with g.cond:
+            if g.owner is not handle.token:
+                return
+            g.owner = None
+            _clear_holder(g.fd)
+            if g.waiters and g.handoffs < MAX_HANDOFFS:
+                g.handoffs += 1
+            else:
+                g.handoffs = 0
+                if g.flocked:
+                    fcntl.flock(g.fd, fcntl.LOCK_UN)
+                    g.flocked = False
+            g.cond.notify_all()
+
+    def close(self) -> None:
+        with self._mutex:
+            groups, self._groups = list(self._groups.values()), {}
+        for g in groups:
+            with g.cond:
+                if g.owner is None and not g.flock_waiting:
+                    g.drop_fd()
+
+@dataclass
+class LockInfo:
+    group: str
+    path: str
+
+    # From /proc/locks (Linux); None where the kernel's lock table isn't readable
+    busy: Optional[bool]
+
+    # What the holder wrote (pid, acquired_at, run_id, script_id), if it's still holding
+    holder: Optional[dict]
+
+def _flock_inodes() -> Optional[set]:
+    """
+    (major, minor, inode) of every flock()ed file, from /proc/locks; None if unavailable.
+    """
+
+    try:
+        with open("/proc/locks", "r", encoding="ascii", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    # "1: FLOCK  ADVISORY  WRITE 1234 fd:01:5678 0 EOF" (device in hex)
+    out = set()
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 6 or fields[1] != "FLOCK":
+            continue
+        try:
+            major, minor, ino = fields[5].split(":")
+            out.add((int(major, 16), int(minor, 16), int(ino)))
+        except ValueError:
+            continue
+    return out
+
+def read_locks(lock_dir: str) -> List[LockInfo]:
+    """
+    State of every lock group in lock_dir, without acquiring anything.
+    """
+
+    locked = _flock_inodes()
+    out = []
+    for path in sorted(Path(lock_dir).glob("*.lock")):
+        try:
+            st = os.stat(path)
+            raw = path.read_bytes()[:4096]
+        except OSError:
+            continue
+
+        busy = None
+        if locked is not None:
+            busy = (os.major(st.st_dev), os.minor(st.st_dev), st.st_ino) in locked
+
+        holder = None
+        if raw:
+            try:
+                holder = json.loads(raw)
+            except ValueError:
+                holder = None
+        if holder is not None:
+            # Left behind by a holder that died (or by a racing write): ignore it
+            pid = holder.get("pid")
+            if busy is False or not isinstance(pid, int) or not pid_is_running(pid):
+                holder = None
+        if busy is None:
+            busy = holder is not None
+
+        out.append(LockInfo(group=path.stem, path=str(path), busy=busy, holder=holder))
+    return out
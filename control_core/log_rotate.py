@@ -1,16 +1,295 @@
+import fcntl
+import json
+import os
 import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Callable, Iterator, List, Optional
 
 LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
 
-def rotate_logs() -> Path:
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not LOG_PATH.exists() or LOG_PATH.stat().st_size == 0:
-        LOG_PATH.touch(exist_ok=True)
-        return LOG_PATH
-    
-    ts = time.strftime("%Y%m%d-%H%m%S")
-    archived = LOG_PATH.parent / f"logs-{ts}.jsonl"
-    LOG_PATH.rename(archived)
-    LOG_PATH.touch(exist_ok=True)
-    return archived
\ No newline at end of file
+# The live log rolls into a segment once it reaches either limit (0 disables that limit)
+DEFAULT_SEGMENT_BYTES = 32 * 1024 * 1024
+DEFAULT_SEGMENT_SECONDS = 24 * 3600.0
+
+# Records from another process can land in a segment just after it was scanned
+SEGMENT_SLACK_SECONDS = 60.0
+
+# Block size for reading files backwards (last-N queries)
+READ_BLOCK = 64 * 1024
+
+@dataclass
+class Segment:
+    # File name, next to the live log
+    file: str
+
+    # Range of record times (ended_at, else started_at); None when it had none
+    first_ts: Optional[float]
+    last_ts: Optional[float]
+
+    records: int
+    bytes: int
+
+def record_time(e: dict) -> Optional[float]:
+    t = e.get("ended_at")
+    if t is None:
+        t = e.get("started_at")
+    return t if isinstance(t, (int, float)) else None
+
+def _manifest_path(log_path: Path) -> Path:
+    return log_path.with_name(f"{log_path.stem}.segments.json")
+
+def iter_file(path: Path) -> Iterator[dict]:
+    try:
+        f = path.open("r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def iter_lines_reverse(path: Path, end: Optional[int] = None, block_size: int = READ_BLOCK) -> Iterator[bytes]:
+    """
+    Non-empty lines of a file, last first, reading block_size blocks back from `end`
+    (default EOF); only as much of the file is read as the caller consumes.
+    """
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        pos = os.fstat(fd).st_size if end is None else end
+        head = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            lines = (os.pread(fd, step, pos) + head).split(b"\n")
+
+            # The first piece may continue in the previous block
+            head = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if head.strip():
+            yield head
+    finally:
+        os.close(fd)
+
+def iter_file_reverse(path: Path, end: Optional[int] = None) -> Iterator[dict]:
+    for line in iter_lines_reverse(path, end):
+        try:
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+
+def first_record_time(path: Path) -> Optional[float]:
+    for e in iter_file(path):
+        return record_time(e)
+    return None
+
+def scan_segment(path: Path) -> Segment:
+    first = last = None
+    records = 0
+    for e in iter_file(path):
+        records += 1
+        t = record_time(e)
+        if t is None:
+            continue
+        first = t if first is None else min(first, t)
+        last = t if last is None else max(last, t)
+    try:
+        size = path.stat().st_size
+    except OSError:
+        size = 0
+    return Segment(file=path.name, first_ts=first, last_ts=last, records=records, bytes=size)
+
+@contextmanager
+def _rotate_lock(log_path: Path):
+    # Serializes rolling and manifest updates across the daemon and CLI processes
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(log_path.with_name(f".{log_path.stem}.rotate.lock"), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def _read_manifest(log_path: Path) -> List[Segment]:
+    try:
+        raw = json.loads(_manifest_path(log_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+
+    out = []
+    for item in raw.get("segments", []) if isinstance(raw, dict) else []:
+        try:
+            out.append(Segment(**item))
+        except TypeError:
+            continue
+    return out
+
+def _write_manifest(log_path: Path, segments: List[Segment]) -> None:
+    path = _manifest_path(log_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"segments": [asdict(s) for s in segments]}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _sort_key(s: Segment) -> float:
+    return s.last_ts if s.last_ts is not None else 0.0
+
+def load_segments(log_path: Path = LOG_PATH) -> List[Segment]:
+    """
+    Rolled segments, oldest first. Segments missing from the manifest (rotated by an
+    older version, or a crash between rename and manifest write) are scanned and added.
+    """
+
+    segments = [s for s in _read_manifest(log_path) if (log_path.parent / s.file).exists()]
+    listed = {s.file for s in segments}
+    unlisted = [p for p in log_path.parent.glob(f"{log_path.stem}-*.jsonl") if p.name not in listed]
+    if not unlisted:
+        return segments
+
+    with _rotate_lock(log_path):
+        segments = [s for s in _read_manifest(log_path) if (log_path.parent / s.file).exists()]
+        listed = {s.file for s in segments}
+        for p in unlisted:
+            if p.name not in listed and p.exists():
+                segments.append(scan_segment(p))
+        segments.sort(key=_sort_key)
+        _write_manifest(log_path, segments)
+    return segments
+
+def _archive_path(log_path: Path) -> Path:
+    ts = time.strftime("%Y%m%d-%H%M%S")
+    archived = log_path.with_name(f"{log_path.stem}-{ts}.jsonl")
+    n = 1
+    while archived.exists():
+        archived = log_path.with_name(f"{log_path.stem}-{ts}-{n}.jsonl")
+        n += 1
+    return archived
+
+def rotate_logs(log_path: Path = LOG_PATH, expected_ino: Optional[int] = None) -> Path:
+    """
+    Rolls the live log into a segment and records it in the manifest; returns the
+    segment's path, or log_path when there was nothing to roll. With expected_ino,
+    only rolls if the live log is still that file (someone else may have rolled it).
+    """
+
+    with _rotate_lock(log_path):
+        try:
+            st = os.stat(log_path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_size == 0:
+            log_path.touch(exist_ok=True)
+            return log_path
+        if expected_ino is not None and st.st_ino != expected_ino:
+            return log_path
+
+        archived = _archive_path(log_path)
+        log_path.rename(archived)
+        log_path.touch(exist_ok=True)
+
+        segments = [s for s in _read_manifest(log_path) if (log_path.parent / s.file).exists()]
+        segments.append(scan_segment(archived))
+        _write_manifest(log_path, segments)
+    return archived
+
+def iter_segments(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    *,
+    newest_first: bool = False,
+    log_path: Path = LOG_PATH,
+) -> Iterator[Path]:
+    """
+    Log files that may hold records timed within [since, until]: the rolled segments
+    whose range overlaps it, then the live log. Oldest first unless newest_first.
+    """
+
+    paths = []
+    for s in load_segments(log_path):
+        if since is not None and s.last_ts is not None and s.last_ts + SEGMENT_SLACK_SECONDS < since:
+            continue
+        if until is not None and s.first_ts is not None and s.first_ts - SEGMENT_SLACK_SECONDS > until:
+            continue
+        paths.append(log_path.parent / s.file)
+    paths.append(log_path)
+
+    if newest_first:
+        paths.reverse()
+    yield from paths
+
+def iter_records(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    *,
+    log_path: Path = LOG_PATH,
+) -> Iterator[dict]:
+    """
+    Records across segments and the live log, oldest first; with since/until, only
+    those timed within the window.
+    """
+
+    for path in iter_segments(since, until, log_path=log_path):
+        for e in iter_file(path):
+            if since is None and until is None:
+                yield e
+                continue
+            t = record_time(e)
+            if t is None or (since is not None and t < since) or (until is not None and t > until):
+                continue
+            yield e
+
+def tail_records(
+    n: int,
+    match: Optional[Callable[[dict], bool]] = None,
+    *,
+    log_path: Path = LOG_PATH,
+) -> List[dict]:
+    """
+    The last n records (that match), oldest first. Files are read backwards from the
+    end and reading stops at the n-th match, so the cost follows n, not the log size.
+    """
+
+    out: List[dict] = []
+    if n <= 0:
+        return out
+    for path in iter_segments(newest_first=True, log_path=log_path):
+        for e in iter_file_reverse(path):
+            if match is None or match(e):
+                out.append(e)
+                if len(out) >= n:
+                    out.reverse()
+                    return out
+    out.reverse()
+    return out
+
+def tail_since(since: float, *, log_path: Path = LOG_PATH) -> List[dict]:
+    """
+    Records timed at or after `since`, oldest first. Reads backwards like tail_records
+    and stops at the first record older than the window (less the slack for records
+    appended slightly out of order).
+    """
+
+    out: List[dict] = []
+    for path in iter_segments(since, newest_first=True, log_path=log_path):
+        for e in iter_file_reverse(path):
+            t = record_time(e)
+            if t is None:
+                continue
+            if t >= since:
+                out.append(e)
+            elif t < since - SEGMENT_SLACK_SECONDS:
+                out.reverse()
+                return out
+    out.reverse()
+    return out
@@ -1,49 +1,76 @@
-import json 
+import os
 import time
-from pathlib import Path
-from typing import Dict, Iterator, Optional
-
-LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
-
-def iter_log_lines() -> Iterator[dict]:
-    if not LOG_PATH.exists():
-        return
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+from typing import Dict, Iterable, List, Optional
+
+from .log_rotate import LOG_PATH, iter_file_reverse, iter_lines_reverse, iter_segments
+from .runstore import open_store
+
+def last_run_by_script(script_ids: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """
+    Latest record per script_id. Reads the log backwards from the newest file and,
+    given the script_ids of interest, stops once all of them have been found.
+    """
+
+    store = open_store()
+    if store is not None:
+        return store.last_by_script(script_ids)
 
-def last_run_by_script() -> Dict[str, dict]:
+    wanted = set(script_ids) if script_ids is not None else None
     last: Dict[str, dict] = {}
-    for e in iter_log_lines():
-        sid = e.get("script_id")
-        if not sid:
-            continue
-        last[sid] = e
+    for path in iter_segments(newest_first=True):
+        for e in iter_file_reverse(path):
+            sid = e.get("script_id")
+            if not sid or sid in last:
+                continue
+            last[sid] = e
+            if wanted is not None and wanted.issubset(last):
+                return last
     return last
 
 def tail_follow(n: int = 20, poll: float = 0.5) -> None:
     LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
     LOG_PATH.touch(exist_ok=True)
 
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[-n:]:
-            print(line.rstrip())
-        try:
-            while True:
-                where = f.tell()
-                line = f.readline()
-                if not line:
-                    time.sleep(poll)
-                    f.seek(where)
-                    continue
+    f = LOG_PATH.open("r", encoding="utf-8")
+    try:
+        # Everything up to here is printed from the end backwards, the rest as it arrives
+        end = f.seek(0, os.SEEK_END)
+        for line in _last_lines(n, end):
+            print(line)
+        while True:
+            where = f.tell()
+            line = f.readline()
+            if line:
                 print(line.rstrip())
-        except KeyboardInterrupt:
-            print("\nStopped tail.")
-        
\ No newline at end of file
+                continue
+            f.seek(where)
+            if _rolled(f):
+                # Rolled into a segment (and drained above): follow the new live log
+                f.close()
+                f = LOG_PATH.open("r", encoding="utf-8")
+                continue
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        print("\nStopped tail.")
+    finally:
+        f.close()
+
+def _last_lines(n: int, end: int) -> List[str]:
+    # Last n lines up to byte `end` of the live log, continuing into rolled segments
+    lines: List[str] = []
+    if n <= 0:
+        return lines
+    for path in iter_segments(newest_first=True):
+        for raw in iter_lines_reverse(path, end if path == LOG_PATH else None):
+            lines.append(raw.decode("utf-8", errors="replace").rstrip())
+            if len(lines) >= n:
+                lines.reverse()
+                return lines
+    lines.reverse()
+    return lines
+
+def _rolled(f) -> bool:
+    try:
+        return os.stat(LOG_PATH).st_ino != os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .log_rotate import DEFAULT_SEGMENT_BYTES, DEFAULT_SEGMENT_SECONDS, first_record_time, rotate_logs
+from .runstore import RunStore, row_for, store_enabled
+
+# Records waiting to be written; what happens when it's full is the backpressure policy:
+# - block: the caller waits for room (nothing is lost; the default)
+# - drop: the record is dropped and counted (LogWriter.dropped)
+# - inline: the caller writes the record itself, synchronously
+BACKPRESSURE_POLICIES = ("block", "drop", "inline")
+
+# fsync policy:
+# - never: leave it to the kernel (a process crash loses nothing written, a power loss may)
+# - interval: fdatasync at most every FSYNC_INTERVAL_SECONDS (the default)
+# - always: fdatasync after every batch
+FSYNC_POLICIES = ("never", "interval", "always")
+
+DEFAULT_QUEUE_MAX = 10000
+DEFAULT_FLUSH_SECONDS = 0.05
+FSYNC_INTERVAL_SECONDS = 1.0
+
+# One write() is at most this much, so a batch still lands as whole lines next to
+# other processes appending to the same file
+MAX_BATCH_BYTES = 1024 * 1024
+
+def _encode(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False)
+
+def _datasync(fd: int) -> None:
+    if hasattr(os, "fdatasync"):
+        os.fdatasync(fd)
+    else:
+        os.fsync(fd)
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+class LogWriter:
+    """
+    Appends JSONL records from a background thread.
+    write() only encodes the record and queues it; the thread collects what arrives
+    within flush_seconds and appends it with one O_APPEND write(), so lines from the
+    daemon and CLI processes never interleave. The fd is kept open and reopened when
+    the file is rotated away. Once the file reaches segment_bytes, or its first record
+    is segment_seconds old, it is rolled into a segment (log_rotate.rotate_logs).
+    Everything queued is written by flush(), close(), and at interpreter exit.
+    With a RunStore, each batch is also inserted there in one transaction.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        fsync: str = "interval",
+        backpressure: str = "block",
+        queue_max: int = DEFAULT_QUEUE_MAX,
+        segment_bytes: int = 0,
+        segment_seconds: float = 0.0,
+        store: Optional[RunStore] = None,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"backpressure must be one of {', '.join(BACKPRESSURE_POLICIES)}")
+
+        self.path = path
+        self.flush_seconds = max(0.0, flush_seconds)
+        self.fsync = fsync
+        self.backpressure = backpressure
+        self.queue_max = max(1, queue_max)
+        self.segment_bytes = max(0, segment_bytes)
+        self.segment_seconds = max(0.0, segment_seconds)
+        self.store = store
+
+        self.dropped = 0
+        self.write_errors = 0
+        self.store_errors = 0
+        self._reset()
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        # Fresh state (also in a forked child, where the thread and lock didn't survive)
+        self._cond = threading.Condition()
+        # (encoded line, run store row or None)
+        self._pending: Deque[Tuple[bytes, Optional[tuple]]] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._flush_now = False
+
+        # Records queued / written so far, for flush()
+        self._queued = 0
+        self._written = 0
+
+        # Serializes the file writes (the thread and inline callers)
+        self._io_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._synced_at = time.monotonic()
+
+        # Time of the open file's first record, for segment_seconds
+        self._started: Optional[float] = None
+        self._unsynced = False
+
+    def write(self, record: Dict[str, Any]) -> None:
+        text = _encode(record)
+        line = ((text + "\n").encode("utf-8"), row_for(record, text) if self.store is not None else None)
+        with self._cond:
+            if self._closed:
+                inline = True
+            else:
+                while len(self._pending) >= self.queue_max and self.backpressure == "block":
+                    self._flush_now = True
+                    self._ensure_thread()
+                    self._cond.notify_all()
+                    self._cond.wait()
+                inline = len(self._pending) >= self.queue_max and self.backpressure == "inline"
+                if len(self._pending) >= self.queue_max and self.backpressure == "drop":
+                    self.dropped += 1
+                    return
+
+            if not inline:
+                self._pending.append(line)
+                self._queued += 1
+                if self._thread is None:
+                    self._ensure_thread()
+                elif len(self._pending) == 1 or len(self._pending) >= self.queue_max // 2:
+                    self._cond.notify_all()
+                return
+
+        self._append([line])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until everything queued so far is on disk (per the fsync policy).
+        False on timeout.
+        """
+
+        with self._cond:
+            target = self._queued
+            if self._written >= target:
+                return True
+            self._flush_now = True
+            if self._pending and not self._closed:
+                self._ensure_thread()
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._written >= target or self._thread is None, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._cond:
+            # Left behind by a thread that died
+            rest = list(self._pending)
+            self._pending.clear()
+        if rest:
+            self._append(rest)
+        with self._io_lock:
+            self._close_fd()
+            if self.store is not None:
+                self.store.close()
+
+    def _ensure_thread(self) -> None:
+        # Under self._cond
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        except Exception:
+            self.write_errors += 1
+            raise
+        finally:
+            # Also when the loop died: the next write() (or a blocked one) starts a new thread
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                self._cond.notify_all()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    if not self._unsynced:
+                        self._cond.wait()
+                        continue
+                    # Quiet now: sync the last batch once its interval is up
+                    remaining = self._synced_at + FSYNC_INTERVAL_SECONDS - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._pending and self._closed:
+                    return
+
+                # Give a burst flush_seconds to gather into one batch
+                deadline = time.monotonic() + self.flush_seconds
+                while self._pending and not (self._closed or self._flush_now or len(self._pending) >= self.queue_max // 2):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._take_batch()
+                if not self._pending:
+                    self._flush_now = False
+                self._cond.notify_all()
+
+            try:
+                self._append(batch)
+            except Exception:
+                # A corrupt segment met while rolling, a bug...: count it and keep the thread alive
+                self.write_errors += 1
+            finally:
+                with self._cond:
+                    self._written += len(batch)
+                    self._cond.notify_all()
+
+    def _take_batch(self) -> List[Tuple[bytes, Optional[tuple]]]:
+        batch: List[Tuple[bytes, Optional[tuple]]] = []
+        size = 0
+        while self._pending and (not batch or size + len(self._pending[0][0]) <= MAX_BATCH_BYTES):
+            item = self._pending.popleft()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _append(self, batch: List[Tuple[bytes, Optional[tuple]]]) -> None:
+        lines = [line for line, _ in batch]
+        roll_ino = None
+        with self._io_lock:
+            try:
+                fd = self._open()
+                if lines:
+                    _write_all(fd, b"".join(lines))
+                    self._unsynced = self.fsync == "interval"
+                    if self._started is None:
+                        self._started = time.time()
+                now = time.monotonic()
+                if self.fsync == "always" or (self._unsynced and now - self._synced_at >= FSYNC_INTERVAL_SECONDS):
+                    _datasync(fd)
+                    self._synced_at = now
+                    self._unsynced = False
+                if lines and self._roll_due(fd):
+                    roll_ino = self._ino
+                    self._close_fd()
+            except OSError:
+                # Disk full, directory removed...: lose this batch rather than the daemon
+                self.write_errors += 1
+                self._close_fd()
+
+            rows = [row for _, row in batch if row is not None]
+            if rows:
+                try:
+                    self.store.insert_rows(rows)
+                except (sqlite3.Error, OSError):
+                    # The JSONL log still has them; `cli store-import` catches the store up
+                    self.store_errors += 1
+
+        if roll_ino is not None:
+            try:
+                rotate_logs(self.path, expected_ino=roll_ino)
+            except OSError:
+                self.write_errors += 1
+
+    def _roll_due(self, fd: int) -> bool:
+        if self.segment_bytes and os.fstat(fd).st_size >= self.segment_bytes:
+            return True
+        return bool(self.segment_seconds) and self._started is not None and time.time() - self._started >= self.segment_seconds
+
+    def _open(self) -> int:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._fd is not None and (st is None or st.st_ino != self._ino):
+            # Rotated or removed: the next batch goes to a fresh file at the path
+            self._close_fd()
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._ino = os.fstat(self._fd).st_ino
+            self._started = first_record_time(self.path)
+        return self._fd
+
+    def _close_fd(self) -> None:
+        if self._fd is not None:
+            if self._unsynced:
+                try:
+                    _datasync(self._fd)
+                except OSError:
+                    pass
+            os.close(self._fd)
+        self._fd = None
+        self._ino = None
+        self._unsynced = False
+
+def writer_from_env(path: Path) -> LogWriter:
+    """
+    LogWriter configured from CONTROL_CORE_LOG_FLUSH (seconds), CONTROL_CORE_LOG_FSYNC,
+    CONTROL_CORE_LOG_BACKPRESSURE, CONTROL_CORE_LOG_QUEUE, CONTROL_CORE_LOG_SEGMENT_BYTES
+    and CONTROL_CORE_LOG_SEGMENT_SECONDS (and CONTROL_CORE_RUN_STORE, see runstore.py);
+    bad values fall back to defaults.
+    """
+
+    try:
+        flush_seconds = float(os.environ.get("CONTROL_CORE_LOG_FLUSH", DEFAULT_FLUSH_SECONDS))
+    except ValueError:
+        flush_seconds = DEFAULT_FLUSH_SECONDS
+    try:
+        queue_max = int(os.environ.get("CONTROL_CORE_LOG_QUEUE", DEFAULT_QUEUE_MAX))
+    except ValueError:
+        queue_max = DEFAULT_QUEUE_MAX
+    try:
+        segment_bytes = int(os.environ.get("CONTROL_CORE_LOG_SEGMENT_BYTES", DEFAULT_SEGMENT_BYTES))
+    except ValueError:
+        segment_bytes = DEFAULT_SEGMENT_BYTES
+    try:
+        segment_seconds = float(os.environ.get("CONTROL_CORE_LOG_SEGMENT_SECONDS", DEFAULT_SEGMENT_SECONDS))
+    except ValueError:
+        segment_seconds = DEFAULT_SEGMENT_SECONDS
+
+    fsync = os.environ.get("CONTROL_CORE_LOG_FSYNC", "interval")
+    backpressure = os.environ.get("CONTROL_CORE_LOG_BACKPRESSURE", "block")
+    return LogWriter(
+        path,
+        flush_seconds=flush_seconds,
+        fsync=fsync if fsync in FSYNC_POLICIES else "interval",
+        backpressure=backpressure if backpressure in BACKPRESSURE_POLICIES else "block",
+        queue_max=queue_max,
+        segment_bytes=segment_bytes,
+        segment_seconds=segment_seconds,
+        store=RunStore() if store_enabled() else None,
+    )
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import socket
+import struct
+from typing import Optional, Tuple
+
+from .events import get_local_ip
+
+# rtnetlink multicast groups (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+# RTM_NEWLINK .. RTM_DELROUTE
+_RTM_TYPES = range(16, 26)
+
+_NLMSGHDR = struct.Struct("=IHHII")
+
+ROUTE_PATH = "/proc/net/route"
+IPV6_ROUTE_PATH = "/proc/net/ipv6_route"
+
+_RTF_UP = 0x1
+
+def _read(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+def default_route_interface(route: Optional[bytes] = None, ipv6_route: Optional[bytes] = None) -> Optional[str]:
+    """
+    Interface of the lowest-metric default route (IPv4 first, then IPv6), or None.
+    """
+
+    route = _read(ROUTE_PATH) if route is None else route
+    best: Optional[Tuple[int, str]] = None
+
+    # Iface Destination Gateway Flags RefCnt Use Metric Mask ...
+    for line in route.splitlines()[1:]:
+        f = line.split()
+        if len(f) < 8 or f[1] != b"00000000" or f[7] != b"00000000":
+            continue
+        try:
+            if not int(f[3], 16) & _RTF_UP:
+                continue
+            metric = int(f[6])
+        except ValueError:
+            continue
+        if best is None or metric < best[0]:
+            best = (metric, f[0].decode())
+    if best is not None:
+        return best[1]
+
+    # dest dest_plen src src_plen next_hop metric refcnt use flags iface
+    ipv6_route = _read(IPV6_ROUTE_PATH) if ipv6_route is None else ipv6_route
+    for line in ipv6_route.splitlines():
+        f = line.split()
+        if len(f) < 10 or f[1] != b"00" or f[0].strip(b"0") or f[9] == b"lo":
+            continue
+        try:
+            if not int(f[8], 16) & _RTF_UP:
+                continue
+            metric = int(f[5], 16)
+        except ValueError:
+            continue
+        if best is None or metric < best[0]:
+            best = (metric, f[9].decode())
+    return best[1] if best is not None else None
+
+class RouteMonitor:
+    """
+    Tells when the default route may have changed.
+    Subscribes to rtnetlink link/address/route notifications, so nothing is read
+    until the kernel reports a change: fileno() becomes readable and changed()
+    drains it. Without netlink (fileno() is None) changed() compares /proc/net/route
+    (and ipv6_route) with the previous read instead; one small read per call.
+    """
+
+    def __init__(self):
+        self._sock: Optional[socket.socket] = None
+        self._last_routes: Optional[bytes] = None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        except (AttributeError, OSError):
+            return
+        try:
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE))
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            return
+        self._sock = sock
+
+    def fileno(self) -> Optional[int]:
+        return self._sock.fileno() if self._sock is not None else None
+
+    def changed(self) -> bool:
+        if self._sock is None:
+            routes = _read(ROUTE_PATH) + b"\0" + _read(IPV6_ROUTE_PATH)
+            changed, self._last_routes = routes != self._last_routes, routes
+            return changed
+
+        relevant = False
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except BlockingIOError:
+                return relevant
+            except OSError:
+                # ENOBUFS: notifications were lost, so assume something changed
+                return True
+            pos = 0
+            while pos + _NLMSGHDR.size <= len(data):
+                length, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, pos)
+                if length < _NLMSGHDR.size:
+                    break
+                if msg_type in _RTM_TYPES:
+                    relevant = True
+                pos += (length + 3) & ~3
+
+    def state(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (default route interface, local address used for it); (None, None) when down.
+        """
+
+        iface = default_route_interface()
+        if iface is None:
+            return None, None
+        return iface, get_local_ip()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+def netlink_available() -> bool:
+    return hasattr(socket, "AF_NETLINK") and os.path.exists(ROUTE_PATH)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+PROC = "/proc"
+
+# comm is truncated to 15 bytes by the kernel; longer names come from cmdline
+_COMM_MAX = 15
+
+# kthreadd: every kernel thread is its child
+_KTHREADD = 2
+
+# Probe new pids one by one (instead of listing /proc) when at most this many were allocated
+_PROBE_MAX = 64
+
+# Full listing at least this often, even when /proc/loadavg says nothing changed
+FULL_SCAN_SECONDS = 10.0
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, 4096)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+def _stat_comm_ppid(pid: str) -> Optional[Tuple[str, int]]:
+    # /proc/<pid>/stat: "pid (comm) state ppid ..."; comm may itself contain ") "
+    data = _read(f"{PROC}/{pid}/stat")
+    if not data:
+        return None
+    lp, rp = data.find(b"("), data.rfind(b")")
+    if lp < 0 or rp < 0:
+        return None
+    fields = data[rp + 2:].split(b" ", 2)
+    try:
+        ppid = int(fields[1])
+    except (IndexError, ValueError):
+        return None
+    return data[lp + 1:rp].decode("utf-8", errors="replace"), ppid
+
+def _loadavg_gate() -> Optional[Tuple[int, int]]:
+    # "0.79 0.24 0.10 1/3071 14553": (threads in the system, last pid allocated)
+    data = _read(f"{PROC}/loadavg")
+    if not data:
+        return None
+    try:
+        _, _, _, counts, last_pid = data.split()
+        return int(counts.split(b"/")[1]), int(last_pid)
+    except ValueError:
+        return None
+
+def _is_process(pid: str) -> Optional[bool]:
+    """
+    True for a thread group leader, False for a thread, None if it's gone.
+    """
+
+    data = _read(f"{PROC}/{pid}/status")
+    if not data:
+        return None
+    i = data.find(b"\nTgid:")
+    if i < 0:
+        return None
+    return data[i + 6:data.index(b"\n", i + 1)].strip() == pid.encode()
+
+def _process_name(pid: str) -> Tuple[Optional[str], int]:
+    """
+    (name, ppid) for a live pid; name is None for kernel threads and vanished processes.
+    """
+
+    info = _stat_comm_ppid(pid)
+    if info is None:
+        return None, 0
+    comm, ppid = info
+    if ppid == _KTHREADD or pid == str(_KTHREADD):
+        return None, ppid
+
+    if len(comm.encode("utf-8")) >= _COMM_MAX:
+        cmdline = _read(f"{PROC}/{pid}/cmdline")
+        if cmdline:
+            argv0 = os.path.basename(cmdline.split(b"\0", 1)[0].decode("utf-8", errors="replace"))
+            if argv0.startswith(comm):
+                comm = argv0
+    return comm, ppid
+
+class ProcessTracker:
+    """
+    Linux replacement for list_running_apps_macos built on /proc.
+    Each poll first reads /proc/loadavg (thread count, last pid allocated):
+    - neither changed: nothing was created or exited, the poll ends there;
+    - a few pids were allocated and nothing exited: only those pids are probed;
+    - otherwise /proc is listed and diffed against the known pid set.
+    Only new pids are ever read (stat, plus cmdline when comm is truncated). Process
+    names are reference-counted, so app_open fires when the first process with a name
+    appears and app_close when the last one exits.
+    Kernel threads and this process's own descendants (script runs, workers) are ignored.
+    """
+
+    def __init__(self):
+        self._pids: Dict[str, Optional[str]] = {}
+        self._counts: Counter = Counter()
+        self._own: Set[str] = {str(os.getpid())}
+        self._primed = False
+        self._gate: Optional[Tuple[int, int]] = None
+        self._next_full_scan = 0.0
+
+        # The non-pid entries of /proc (self, net, loadavg, ...) never change
+        self._static: Optional[Set[str]] = None
+
+    @staticmethod
+    def available() -> bool:
+        return os.path.isfile(f"{PROC}/self/stat")
+
+    def running_apps(self) -> Set[str]:
+        return set(self._counts)
+
+    def poll(self) -> Tuple[Set[str], Set[str]]:
+        """
+        (opened, closed) process names since the last poll. The first poll only
+        records what is running and returns two empty sets.
+        """
+
+        now = time.monotonic()
+        gate = _loadavg_gate()
+        prev, self._gate = self._gate, gate
+        if gate is not None and prev is not None and now < self._next_full_scan:
+            created = gate[1] - prev[1]
+            exited = prev[0] + created - gate[0]
+            if created == 0 and exited == 0:
+                return set(), set()
+            if 0 < created <= _PROBE_MAX and exited == 0:
+                new = self._probe(range(prev[1] + 1, gate[1] + 1))
+                if new is not None:
+                    return self._apply(set(), new)
+
+        try:
+            entries = os.listdir(PROC)
+        except OSError:
+            return set(), set()
+        self._next_full_scan = now + FULL_SCAN_SECONDS
+        cur = set(entries)
+        if self._static is None:
+            self._static = {e for e in cur if not e.isdigit()}
+        cur -= self._static
+        return self._apply(self._pids.keys() - cur, sorted(cur - self._pids.keys(), key=int))
+
+    def _probe(self, candidates) -> Optional[List[str]]:
+        """
+        New process pids among freshly allocated ones (threads skipped), or None when the
+        picture doesn't add up (something already exited) and a full listing is needed.
+        """
+
+        out = []
+        for n in candidates:
+            pid = str(n)
+            kind = _is_process(pid)
+            if kind is None:
+                return None
+            if kind and pid not in self._pids:
+                out.append(pid)
+        return out
+
+    def _apply(self, gone: Iterable[str], new: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        pids = self._pids
+        opened: Set[str] = set()
+        closed: Set[str] = set()
+
+        for pid in gone:
+            name = pids.pop(pid)
+            self._own.discard(pid)
+            if name is None:
+                continue
+            self._counts[name] -= 1
+            if self._counts[name] <= 0:
+                del self._counts[name]
+                closed.add(name)
+
+        # Ascending pid order so parents are usually seen before their children
+        for pid in new:
+            name, ppid = _process_name(pid)
+            if str(ppid) in self._own:
+                self._own.add(pid)
+                name = None
+            pids[pid] = name
+            if name is None:
+                continue
+            self._counts[name] += 1
+            if self._counts[name] == 1:
+                opened.add(name)
+
+        if not self._primed:
+            self._primed = True
+            return set(), set()
+
+        # A short-lived name that came and went between polls is neither
+        return opened - closed, closed - opened
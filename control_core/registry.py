@@ -1,7 +1,10 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+from .compiled_schedule import CompiledSchedule, compile_schedule
+from .daemon_state import wake_daemon
 
 SCRIPTS_DIR = Path(__file__).resolve().parent / "scripts"
 
@@ -19,6 +22,20 @@ class Script:
     lock_mode: str = "skip"
     lock_timeout_seconds: float = 0.0
 
+    # Triggers while already running (see runqueue.QUEUE_POLICIES)
+    queue_policy: str = "drop"
+    queue_max: int = 10
+
+    # Admission: higher priority starts first; the daemon caps concurrent runs per class
+    priority: int = 0
+    concurrency_class: str = "default"
+
+    # Interval/time schedules compiled once per manifest load (None for other types)
+    compiled: Optional[CompiledSchedule] = field(default=None, init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "compiled", compile_schedule(self.schedule))
+
 def _valid_hhmm(s: str) -> bool:
     try:
         parts = s.strip().split(":")
@@ -156,7 +173,20 @@ def _normalize_schedule(sched: dict) -> dict:
             poll_seconds = float(sched.get("poll_seconds", 1.0) or 1.0)
         except Exception:
             poll_seconds = 1.0
-        return {"type": "file_watch", "path": p, "poll_seconds": poll_seconds}
+        out = {"type": "file_watch", "path": p, "poll_seconds": poll_seconds}
+
+        # Wait until the path has been quiet this long before running
+        try:
+            settle_seconds = float(sched.get("settle_seconds", 0) or 0)
+        except Exception:
+            settle_seconds = 0.0
+        if settle_seconds > 0:
+            out["settle_seconds"] = settle_seconds
+
+        # Skip runs when size + content hash are unchanged (e.g. a bare touch)
+        if sched.get("content_hash") is True:
+            out["content_hash"] = True
+        return out
     
     if stype == "on_failure":
         target = sched.get("target", "*")
@@ -170,6 +200,48 @@ def _load_manifest(path: Path) -> dict:
 def _save_manifest(path: Path, data: dict) -> None:
     path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
 
+def _script_from_manifest(script_dir: Path, data: dict) -> Script:
+    # Backward compatible
+    lock_group = data.get("lock_group", data.get("lock"))
+    lock_mode = data.get("lock_mode", "skip")
+    if lock_mode not in ("skip", "wait"):
+        lock_mode = "skip"
+    lock_timeout_seconds = float(data.get("lock_timeout_seconds", 0.0) or 0.0)
+    if lock_timeout_seconds < 0:
+        lock_timeout_seconds = 0.0
+
+    queue_policy = data.get("queue_policy", "drop")
+    if queue_policy not in ("drop", "coalesce", "latest", "queue"):
+        queue_policy = "drop"
+    try:
+        queue_max = max(1, int(data.get("queue_max", 10)))
+    except (TypeError, ValueError):
+        queue_max = 10
+
+    try:
+        priority = int(data.get("priority", 0) or 0)
+    except (TypeError, ValueError):
+        priority = 0
+    concurrency_class = data.get("concurrency_class") or "default"
+    if not isinstance(concurrency_class, str):
+        concurrency_class = "default"
+
+    return Script(
+        id=data["id"],
+        name=data.get("name", data["id"]),
+        enabled=bool(data.get("enabled", False)),
+        entrypoint=data["entrypoint"],
+        schedule=_normalize_schedule(data.get("schedule", {})),
+        path=script_dir,
+        lock_group=lock_group,
+        lock_mode=lock_mode,
+        lock_timeout_seconds=lock_timeout_seconds,
+        queue_policy=queue_policy,
+        queue_max=queue_max,
+        priority=priority,
+        concurrency_class=concurrency_class,
+    )
+
 def discover_scripts() -> Dict[str, Script]:
     scripts: Dict[str, Script] = {}
 
@@ -181,32 +253,75 @@ def discover_scripts() -> Dict[str, Script]:
         if not manifest.exists():
             continue
 
-        data = _load_manifest(manifest)
-
-        # Backward compatible
-        lock_group = data.get("lock_group", data.get("lock"))
-        lock_mode = data.get("lock_mode", "skip")
-        if lock_mode not in ("skip", "wait"):
-            lock_mode = "skip"
-        lock_timeout_seconds = float(data.get("lock_timeout_seconds", 0.0) or 0.0)
-        if lock_timeout_seconds < 0:
-            lock_timeout_seconds = 0.0
-
-        s = Script(
-            id=data["id"],
-            name=data.get("name", data["id"]),
-            enabled=bool(data.get("enabled", False)),
-            entrypoint=data["entrypoint"],
-            schedule=_normalize_schedule(data.get("schedule", {})),
-            path=script_dir,
-            lock_group=lock_group,
-            lock_mode=lock_mode,
-            lock_timeout_seconds=lock_timeout_seconds,
-        )
+        s = _script_from_manifest(script_dir, _load_manifest(manifest))
         scripts[s.id] = s
     
     return scripts
 
+class RegistryCache:
+    """
+    Incremental discover_scripts() for long-running callers.
+    Each manifest is keyed on (mtime_ns, size) and only reparsed when that changes;
+    SCRIPTS_DIR is only relisted when its own mtime changes.
+    `generation` is bumped whenever the returned script set changes.
+    """
+
+    def __init__(self, scripts_dir: Path = SCRIPTS_DIR):
+        self.scripts_dir = scripts_dir
+        self.generation = 0
+        self._dir_sig: Optional[int] = None
+        self._dirs: List[Path] = []
+        self._entries: Dict[Path, Tuple[Tuple[int, int], Optional[Script]]] = {}
+        self._scripts: Dict[str, Script] = {}
+
+    def _list_dirs(self) -> None:
+        try:
+            sig = self.scripts_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            sig = None
+        if sig is not None and sig == self._dir_sig:
+            return
+        self._dir_sig = sig
+        self._dirs = [p for p in self.scripts_dir.iterdir() if p.is_dir()] if sig is not None else []
+
+    def refresh(self) -> Dict[str, Script]:
+        """
+        Returns the current scripts. The dict is shared between calls and must not be mutated.
+        """
+
+        self._list_dirs()
+
+        changed = False
+        seen: Dict[Path, Tuple[Tuple[int, int], Optional[Script]]] = {}
+
+        for script_dir in self._dirs:
+            manifest = script_dir / "script.json"
+            try:
+                st = manifest.stat()
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            sig = (st.st_mtime_ns, st.st_size)
+
+            prev = self._entries.get(manifest)
+            if prev is not None and prev[0] == sig:
+                seen[manifest] = prev
+                continue
+
+            try:
+                s: Optional[Script] = _script_from_manifest(script_dir, _load_manifest(manifest))
+            except (OSError, ValueError, KeyError, TypeError):
+                # Half-written or invalid manifest: keep the last good version until it changes again
+                s = prev[1] if prev is not None else None
+            seen[manifest] = (sig, s)
+            changed = True
+
+        if changed or seen.keys() != self._entries.keys():
+            self._entries = seen
+            self._scripts = {s.id: s for _, s in seen.values() if s is not None}
+            self.generation += 1
+
+        return self._scripts
+
 def list_scripts() -> List[Script]:
     return list(discover_scripts().values())
 
@@ -222,4 +337,7 @@ def update_manifest(script_id: str, updater) -> None:
     
     data = _load_manifest(manifest_path)
     updater(data)
-    _save_manifest(manifest_path, data)
\ No newline at end of file
+    _save_manifest(manifest_path, data)
+
+    # Let a running daemon pick the change up without waiting for its next registry check
+    wake_daemon()
\ No newline at end of file
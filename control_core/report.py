@@ -1,42 +1,9 @@
-import json
 import time
-from collections import defaultdict, deque
-from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
-
-LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
-
-def _iter_events() -> Iterable[dict]:
-    if not LOG_PATH.exists():
-        return []
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
-
-def _iter_events_since(since_epoch: float) -> Iterable[dict]:
-    if not LOG_PATH.exists():
-        return []
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                e = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-
-            t = e.get("ended_at")
-            if t is None:
-                t = e.get("started_at")
-            if isinstance(t, (int, float)) and t >= since_epoch:
-                yield e
+from collections import defaultdict
+from typing import List, Tuple
+
+from .log_rotate import tail_records, tail_since
+from .runstore import open_store
 
 def _duration_ms(e: dict) -> float | None:
     s = e.get("started_at")
@@ -54,9 +21,8 @@ def _err_line(e: dict) -> str:
     return lines[-1] if lines else ""
 
 def build_report(last_n: int = 200, script_id: str | None = None, fails_only: bool = False) -> dict:
-    recent = deque(maxlen=last_n)
-    for e in _iter_events():
-        recent.append(e)
+    store = open_store()
+    recent = store.last(last_n) if store is not None else tail_records(last_n)
 
     per = defaultdict(lambda: {
         "runs": 0,
@@ -134,7 +100,8 @@ def build_report_minutes(minutes: int = 60, script_id: str | None = None, fails_
     slowest: List[Tuple[float, str, str]] = []
 
     count = 0
-    for e in _iter_events_since(since):
+    store = open_store()
+    for e in store.since(since) if store is not None else tail_since(since):
         count += 1
         sid = e.get("script_id")
 
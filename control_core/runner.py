@@ -1,3 +1,4 @@
+import asyncio
 import json
 import subprocess
 import sys
@@ -10,19 +11,178 @@ from uuid import uuid4
 
 from .registry import Script
 from .daemon_state import LOCKS_DIR
-from .locks import acquire_file_lock, release_file_lock
+from .locks import LockManager
+from .completions import completion_bus
+from .logwriter import writer_from_env
+from .workers import BackendUnavailable
 
 LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
 
+# Appends happen on a background thread, in batches (see logwriter.py for the knobs)
+log_writer = writer_from_env(LOG_PATH)
+
 def log_event(event: Dict[str, Any]) -> None:
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with LOG_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    # In-process listeners (the daemon's on_failure dispatch) see the record before it hits disk
+    completion_bus.publish(event)
+    log_writer.write(event)
+
+def _cold_argv(entrypoint: str) -> list:
+    # Launch: python -c "import module; module.func()"
+    module_path, func_name = entrypoint.split(":")
+    code = (
+        "import os, json, importlib; "
+        f"m=importlib.import_module('{module_path}'); "
+        "payload=json.loads(os.environ.get('CONTROL_CORE_PAYLOAD','{}')); "
+        f"fn=getattr(m, '{func_name}'); "
+        "fn(payload) if fn.__code__.co_argcount >= 1 else fn() "
+    )
+    return [sys.executable, "-c", code]
+
+def _execute_cold(entrypoint: str, payload_json: str, timeout_seconds: Optional[float]) -> Tuple[int, str, str]:
+    proc = subprocess.run(
+        _cold_argv(entrypoint),
+        capture_output=True,
+        text=True,
+        timeout=timeout_seconds,
+        env={**os.environ, "CONTROL_CORE_PAYLOAD": payload_json},
+    )
+    return proc.returncode, proc.stdout, proc.stderr
 
-def run_script(script: Script, timeout_seconds: Optional[float] = 30.0, payload: Optional[dict] = None) -> Tuple[bool, str]:
+# Optional execution backend (workers.WorkerPool, zygote.Zygote); None means a cold `python -c` process per run.
+# Backends have a `mode` name and implement execute(entrypoint, payload_json, timeout) with the same
+# contract as _execute_cold, raising workers.BackendUnavailable when the run was never dispatched.
+_backend = None
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+def _execute(entrypoint: str, payload_json: str, timeout_seconds: Optional[float]) -> Tuple[int, str, str, str]:
+    """
+    Returns (returncode, stdout, stderr, exec_mode). A TimeoutExpired carries .exec_mode as well.
+    """
+
+    backend = _backend
+    mode = "cold"
+    try:
+        if backend is not None:
+            mode = backend.mode
+            try:
+                return (*backend.execute(entrypoint, payload_json, timeout_seconds), mode)
+            except BackendUnavailable:
+                # Worker/zygote failed to start, pool closed, request not sent: the script has not
+                # run, so run it cold instead. Anything after dispatch comes back as the run's result.
+                mode = "cold"
+        return (*_execute_cold(entrypoint, payload_json, timeout_seconds), mode)
+    except subprocess.TimeoutExpired as e:
+        e.exec_mode = mode
+        raise
+
+def _lock_settings(script: Script) -> Tuple[str, str, float]:
+    lock_group = (getattr(script, "lock_group", None) or script.id or "default")
+    lock_mode = (getattr(script, "lock_mode", "skip") or "skip")
+    lock_timeout_seconds = float(getattr(script, "lock_timeout_seconds", 0.0) or 0.0)
+
+    if lock_mode == "skip":
+        lock_timeout_seconds = 0.0
+    return lock_group, lock_mode, lock_timeout_seconds
+
+# One lock file fd per group for the life of the process, shared by every run in it
+_locks = LockManager(str(LOCKS_DIR))
+
+def _acquire(lock_group: str, lock_timeout_seconds: float, holder: Optional[dict] = None):
+    return _locks.acquire(lock_group, timeout_seconds=lock_timeout_seconds, holder=holder)
+
+def _holder(script: Script, run_id: str) -> dict:
+    return {"run_id": run_id, "script_id": script.id}
+
+def _lock_meta(lock_group: str, lock_mode: str, lock_result, acquired: bool = True) -> Dict[str, Any]:
+    meta = {
+        "lock_group": lock_group,
+        "lock_mode": lock_mode,
+        "lock_acquired": acquired,
+        "lock_wait_seconds": lock_result.wait_seconds,
+        "lock_path": lock_result.path,
+    }
+    if not acquired:
+        meta["skipped_due_to_lock"] = True
+    return meta
+
+def _skipped_record(event_base: dict, timeout_seconds: Optional[float], lock_meta: dict) -> Dict[str, Any]:
+    return {
+        **event_base,
+        "ended_at": time.time(),
+        "ok": False,
+        "exit_code": None,
+        "stdout": "",
+        "stderr": "",
+        "error": f"Skipped: lock_group '{lock_meta['lock_group']}' is busy",
+        "timeout_seconds": timeout_seconds,
+        **lock_meta,
+    }
+
+def _finished_record(
+    event_base: dict,
+    returncode: int,
+    stdout: str,
+    stderr: str,
+    timeout_seconds: Optional[float],
+    exec_mode: str,
+    lock_meta: dict,
+) -> Dict[str, Any]:
+    return {
+        **event_base,
+        "ended_at": time.time(),
+        "ok": returncode == 0,
+        "exit_code": returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "error": stderr if returncode != 0 else "",
+        "timeout_seconds": timeout_seconds,
+        "exec_mode": exec_mode,
+        **lock_meta,
+    }
+
+def _timeout_record(
+    event_base: dict,
+    stdout,
+    stderr,
+    timeout_seconds: Optional[float],
+    exec_mode: str,
+    lock_meta: dict,
+) -> Dict[str, Any]:
+    return {
+        **event_base,
+        "ended_at": time.time(),
+        "ok": False,
+        "exit_code": None,
+        "stdout": stdout if isinstance(stdout, str) else "",
+        "stderr": stderr if isinstance(stderr, str) else "",
+        "timeout": True,
+        "timeout_seconds": timeout_seconds,
+        "exec_mode": exec_mode,
+        **lock_meta,
+    }
+
+def _crashed_record(event_base: dict, lock_meta: dict) -> Dict[str, Any]:
+    return {
+        **event_base,
+        "ended_at": time.time(),
+        "ok": False,
+        "error": traceback.format_exc(),
+        **lock_meta,
+    }
+
+def run_script(
+    script: Script,
+    timeout_seconds: Optional[float] = 30.0,
+    payload: Optional[dict] = None,
+    queue_meta: Optional[dict] = None,
+) -> Tuple[bool, str]:
     """
     Run script.entrypoint in a separate Python process.
-    Captures stdout/stderr and logs structured results.
+    Captures stdout/stderr and logs structured results; queue_meta (the daemon's
+    queue depth / coalesce counts) is added to the record as is.
     """
 
     run_id = str(uuid4())
@@ -33,130 +193,119 @@ def run_script(script: Script, timeout_seconds: Optional[float] = 30.0, payload:
         "script_id": script.id,
         "script_name": script.name,
         "started_at": started,
+        **(queue_meta or {}),
     }
 
     # Lock
-    lock_group = (getattr(script, "lock_group", None) or script.id or "default")
-    lock_mode = (getattr(script, "lock_mode", "skip") or "skip")
-    lock_timeout_seconds = float(getattr(script, "lock_timeout_seconds", 0.0) or 0.0)
-
-    if lock_mode == "skip":
-        lock_timeout_seconds = 0.0
-
-    LOCKS_DIR.mkdir(parents=True, exist_ok=True)
-    lock_result, lock_fd = acquire_file_lock(
-        lock_dir=str(LOCKS_DIR),
-        group=lock_group,
-        timeout_seconds=lock_timeout_seconds,
-    )
+    lock_group, lock_mode, lock_timeout_seconds = _lock_settings(script)
+    lock_result, lock_handle = _acquire(lock_group, lock_timeout_seconds, _holder(script, run_id))
 
     if not lock_result.acquired:
-        ended = time.time()
-        log_event({
-            **event_base,
-            "ended_at": ended,
-            "ok": False,
-            "exit_code": None,
-            "stdout": "",
-            "stderr": "",
-            "error": f"Skipped: lock_group '{lock_group}' is busy",
-            "timeout_seconds": timeout_seconds,
-
-            # Lock metadata
-            "lock_group": lock_group,
-            "lock_mode": lock_mode,
-            "lock_acquired": False,
-            "lock_wait_seconds": lock_result.wait_seconds,
-            "skipped_due_to_lock": True,
-            "lock_path": lock_result.path
-        })
+        log_event(_skipped_record(event_base, timeout_seconds, _lock_meta(lock_group, lock_mode, lock_result, False)))
         return False, run_id
-    # Launch: python -c "import module; module.func()"
-    payload_json = json.dumps(payload or {}, ensure_ascii=False)
 
-    module_path, func_name = script.entrypoint.split(":")
-    code = (
-        "import os, json, importlib; "
-        f"m=importlib.import_module('{module_path}'); "
-        "payload=json.loads(os.environ.get('CONTROL_CORE_PAYLOAD','{}')); "
-        f"fn=getattr(m, '{func_name}'); "
-        "fn(payload) if fn.__code__.co_argcount >= 1 else fn() "
-    )
+    lock_meta = _lock_meta(lock_group, lock_mode, lock_result)
+    payload_json = json.dumps(payload or {}, ensure_ascii=False)
 
     try:
-        proc = subprocess.run(
-            [sys.executable, "-c", code],
-            capture_output=True,
-            text=True,
-            timeout=timeout_seconds,
-            env={**os.environ, "CONTROL_CORE_PAYLOAD": payload_json},
-        )
-        error = proc.stderr if proc.returncode != 0 else ""
-        ended = time.time()
-
-        ok = proc.returncode == 0
-        log_event(
-            {
-                **event_base,
-                "ended_at": ended,
-                "ok": ok,
-                "exit_code": proc.returncode,
-                "stdout": proc.stdout,
-                "stderr": proc.stderr,
-                'error': error,
-                "timeout_seconds": timeout_seconds,
-
-                # Lock metadata
-                "lock_group": lock_group,
-                "lock_mode": lock_mode,
-                "lock_acquired": True,
-                "lock_wait_seconds": lock_result.wait_seconds,
-                "lock_path": lock_result.path
-            }
-        )
-        return ok, run_id
+        returncode, stdout, stderr, exec_mode = _execute(script.entrypoint, payload_json, timeout_seconds)
+        log_event(_finished_record(event_base, returncode, stdout, stderr, timeout_seconds, exec_mode, lock_meta))
+        return returncode == 0, run_id
     
     except subprocess.TimeoutExpired as e:
-        ended = time.time()
-        log_event(
-            {
-                **event_base,
-                "ended_at": ended,
-                "ok": False,
-                "exit_code": None,
-                "stdout": e.stdout if isinstance(e.stdout, str) else "",
-                "stderr": e.stderr if isinstance(e.stderr, str) else "",
-                "timeout": True,
-                "timeout_seconds": timeout_seconds,
-
-                # Lock metadata
-                "lock_group": lock_group,
-                "lock_mode": lock_mode,
-                "lock_acquired": True,
-                "lock_wait_seconds": lock_result.wait_seconds,
-                "lock_path": lock_result.path
-            }
-        )
+        log_event(_timeout_record(
+            event_base, e.stdout, e.stderr, timeout_seconds, getattr(e, "exec_mode", "cold"), lock_meta,
+        ))
         return False, run_id
     
     except Exception:
-        ended = time.time()
-        tb = traceback.format_exc()
-        log_event({
-            **event_base, 
-                "ended_at": ended, 
-                "ok": False, 
-                "error": tb,
-                
-                # Lock metadata
-                "lock_group": lock_group,
-                "lock_mode": lock_mode,
-                "lock_acquired": True,
-                "lock_wait_seconds": lock_result.wait_seconds,
-                "lock_path": lock_result.path
-            })
+        log_event(_crashed_record(event_base, lock_meta))
         return False, run_id
     
     finally:
-        if lock_fd is not None:
-            release_file_lock(lock_fd)
\ No newline at end of file
+        _locks.release(lock_handle)
+
+async def _read_into(stream: asyncio.StreamReader, buf: bytearray) -> None:
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        buf += chunk
+
+async def run_script_async(
+    script: Script,
+    timeout_seconds: Optional[float] = 30.0,
+    payload: Optional[dict] = None,
+    queue_meta: Optional[dict] = None,
+) -> Tuple[bool, str]:
+    """
+    asyncio counterpart of run_script (same locking and log records).
+    Cold runs are asyncio subprocesses whose pipes are read as they stream; lock waits and
+    non-cold backends (warm pool, zygote) run in a worker thread.
+    """
+
+    if _backend is not None:
+        return await asyncio.to_thread(run_script, script, timeout_seconds, payload, queue_meta)
+
+    run_id = str(uuid4())
+    started = time.time()
+
+    event_base = {
+        "run_id": run_id,
+        "script_id": script.id,
+        "script_name": script.name,
+        "started_at": started,
+        **(queue_meta or {}),
+    }
+
+    # Lock (a "skip" lock never blocks, so only waits need a thread)
+    lock_group, lock_mode, lock_timeout_seconds = _lock_settings(script)
+    if lock_timeout_seconds > 0:
+        lock_result, lock_handle = await asyncio.to_thread(_acquire, lock_group, lock_timeout_seconds, _holder(script, run_id))
+    else:
+        lock_result, lock_handle = _acquire(lock_group, lock_timeout_seconds, _holder(script, run_id))
+
+    if not lock_result.acquired:
+        log_event(_skipped_record(event_base, timeout_seconds, _lock_meta(lock_group, lock_mode, lock_result, False)))
+        return False, run_id
+
+    lock_meta = _lock_meta(lock_group, lock_mode, lock_result)
+    payload_json = json.dumps(payload or {}, ensure_ascii=False)
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_cold_argv(script.entrypoint),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "CONTROL_CORE_PAYLOAD": payload_json},
+        )
+        out, err = bytearray(), bytearray()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(_read_into(proc.stdout, out), _read_into(proc.stderr, err), proc.wait()),
+                timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            log_event(_timeout_record(
+                event_base, out.decode("utf-8", errors="replace"), err.decode("utf-8", errors="replace"),
+                timeout_seconds, "cold", lock_meta,
+            ))
+            return False, run_id
+
+        returncode = proc.returncode
+        stdout = out.decode("utf-8", errors="replace")
+        stderr = err.decode("utf-8", errors="replace")
+        log_event(_finished_record(event_base, returncode, stdout, stderr, timeout_seconds, "cold", lock_meta))
+        return returncode == 0, run_id
+
+    except Exception:
+        log_event(_crashed_record(event_base, lock_meta))
+        return False, run_id
+
+    finally:
+        _locks.release(lock_handle)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from collections import Counter, deque
+import time
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set
+
+from .registry import Script
+
+# What happens to a trigger for a script that is already running (manifest `queue_policy`):
+# - drop: nothing (the default, as before); the count shows up on the next run's record
+# - coalesce: all such triggers become one follow-up run, payload["coalesced"] lists their payloads
+# - latest: one follow-up run with the newest trigger's payload
+# - queue: one run per trigger, in order, up to queue_max waiting
+QUEUE_POLICIES = ("drop", "coalesce", "latest", "queue")
+DEFAULT_QUEUE_MAX = 10
+
+# Lock-skipped runs are retried after 1, 2, 4, ... seconds, this many times
+LOCK_RETRY_BASE_SECONDS = 1.0
+LOCK_RETRY_MAX = 5
+
+@dataclass
+class PendingRun:
+    payload: dict
+    label: str
+    detail: str = ""
+
+    # Not submitted before this time (lock retry backoff)
+    ready_at: float = 0.0
+
+    # Triggers this run stands for (>1 when coalesced or superseded)
+    triggers: int = 1
+    lock_retries: int = 0
+
+    # When the (oldest folded-in) trigger arrived, for queue_wait_seconds
+    queued_at: float = field(default_factory=time.time)
+
+def _payloads(run: PendingRun) -> list:
+    return list(run.payload.get("coalesced") or [run.payload])
+
+class RunQueue:
+    """
+    Per-script pending runs, applying each script's queue_policy. The daemon offers a
+    trigger here instead of dropping it when the script is busy, and submits pop()'s
+    result once the script is idle again. Not thread-safe (daemon loop only).
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Deque[PendingRun]] = {}
+        self._dropped: Counter = Counter()
+
+    def __contains__(self, script_id: object) -> bool:
+        return script_id in self._pending
+
+    def depth(self, script_id: str) -> int:
+        q = self._pending.get(script_id)
+        return len(q) if q else 0
+
+    def offer(self, script: Script, run: PendingRun) -> None:
+        sid = script.id
+        policy = script.queue_policy
+        if policy == "drop":
+            self._dropped[sid] += run.triggers
+            return
+
+        q = self._pending.setdefault(sid, deque())
+        if policy == "queue":
+            if len(q) >= script.queue_max:
+                self._dropped[sid] += run.triggers
+                return
+            q.append(run)
+            return
+
+        if not q:
+            if policy == "coalesce":
+                run.payload = {**run.payload, "coalesced": _payloads(run)}
+            q.append(run)
+            return
+
+        # latest / coalesce: fold into the one waiting run
+        prev = q[0]
+        if policy == "coalesce":
+            payloads = _payloads(prev) + _payloads(run)
+            if len(payloads) > script.queue_max:
+                self._dropped[sid] += len(payloads) - script.queue_max
+                payloads = payloads[-script.queue_max:]
+            run.payload = {**run.payload, "coalesced": payloads}
+        run.triggers += prev.triggers
+        run.ready_at = max(run.ready_at, prev.ready_at)
+        run.lock_retries = max(run.lock_retries, prev.lock_retries)
+        run.queued_at = min(run.queued_at, prev.queued_at)
+        q[0] = run
+
+    def requeue(self, script: Script, run: PendingRun, now: float) -> bool:
+        """
+        Puts back a run that was skipped because its lock group was busy, ahead of
+        anything that arrived meanwhile. False (and counted as dropped) once retries run out.
+        """
+
+        if script.queue_policy == "drop" or run.lock_retries >= LOCK_RETRY_MAX:
+            self._dropped[script.id] += run.triggers
+            return False
+
+        run.ready_at = now + LOCK_RETRY_BASE_SECONDS * (2 ** run.lock_retries)
+        run.lock_retries += 1
+
+        q = self._pending.get(script.id)
+        if script.queue_policy == "queue" or not q:
+            self._pending.setdefault(script.id, deque()).appendleft(run)
+            return True
+
+        # The newer waiting run absorbs the retried one
+        newer = q.popleft()
+        if not q:
+            del self._pending[script.id]
+        self.offer(script, run)
+        self.offer(script, newer)
+        return True
+
+    def pop(self, script_id: str, now: float) -> Optional[PendingRun]:
+        q = self._pending.get(script_id)
+        if not q or q[0].ready_at > now:
+            return None
+        run = q.popleft()
+        if not q:
+            del self._pending[script_id]
+        return run
+
+    def script_ids(self) -> List[str]:
+        return list(self._pending)
+
+    def ready_ids(self, now: float) -> List[str]:
+        return [sid for sid, q in self._pending.items() if q[0].ready_at <= now]
+
+    def next_ready_at(self, running: Set[str]) -> Optional[float]:
+        """
+        When the next waiting run of an idle script becomes ready (None if there is none).
+        """
+
+        return min((q[0].ready_at for sid, q in self._pending.items() if sid not in running), default=None)
+
+    def take_dropped(self, script_id: str) -> int:
+        return self._dropped.pop(script_id, 0)
+
+    def discard(self, script_id: str) -> None:
+        self._pending.pop(script_id, None)
+        self._dropped.pop(script_id, None)
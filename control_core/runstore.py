@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .log_rotate import iter_records, record_time
+
+DB_PATH = Path(__file__).resolve().parent.parent / "data" / "runs.sqlite3"
+
+# Rows committed per transaction when importing
+IMPORT_BATCH = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    script_id TEXT,
+    ended_at REAL,
+    ok INTEGER,
+    lock_group TEXT,
+    record TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_run_id ON runs(run_id);
+CREATE INDEX IF NOT EXISTS runs_script_ended ON runs(script_id, ended_at);
+CREATE INDEX IF NOT EXISTS runs_ended ON runs(ended_at);
+CREATE INDEX IF NOT EXISTS runs_ok ON runs(ok);
+"""
+
+def store_enabled() -> bool:
+    """
+    CONTROL_CORE_RUN_STORE=sqlite: runs are also written to DB_PATH, and readers query it.
+    """
+
+    return os.environ.get("CONTROL_CORE_RUN_STORE", "").strip().lower() == "sqlite"
+
+def row_for(record: Dict[str, Any], line: Optional[str] = None) -> tuple:
+    # Column values for a record; `line` is its JSON encoding if already made
+    ok = record.get("ok")
+    return (
+        record.get("run_id"),
+        record.get("script_id"),
+        # Records are placed in time by ended_at, else started_at (as log_rotate.record_time)
+        record_time(record),
+        None if ok is None else int(bool(ok)),
+        record.get("lock_group") or None,
+        line if line is not None else json.dumps(record, ensure_ascii=False),
+    )
+
+def _records(rows: Iterable[tuple]) -> List[dict]:
+    out = []
+    for (raw,) in rows:
+        try:
+            out.append(json.loads(raw))
+        except ValueError:
+            continue
+    return out
+
+class RunStore:
+    """
+    Run records in SQLite (WAL mode, so the CLI reads while the daemon writes), indexed
+    for the read commands: latest runs, a script's history, time windows, last run per
+    script. The JSONL log stays the record of truth that gets rotated and exported;
+    this is an index over it. Connections are per process; one RunStore may be shared
+    by threads (calls are serialized).
+    """
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        # (A connection inherited over fork() must not be used)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn, self._pid = conn, os.getpid()
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def insert(self, records: Iterable[Dict[str, Any]]) -> int:
+        return self.insert_rows([row_for(r) for r in records])
+
+    def insert_rows(self, rows: List[tuple]) -> int:
+        """
+        Adds rows (row_for) in one transaction, skipping run_ids already stored.
+        Returns how many were added.
+        """
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO runs (run_id, script_id, ended_at, ok, lock_group, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                added = conn.total_changes - before
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    # Reads (oldest first, like the JSONL readers)
+
+    def last(self, n: int, lock_group_only: bool = False) -> List[dict]:
+        where = "WHERE lock_group IS NOT NULL" if lock_group_only else ""
+        rows = self._query(f"SELECT record FROM runs {where} ORDER BY id DESC LIMIT ?", (max(0, n),))
+        return _records(reversed(rows))
+
+    def history(self, script_id: str, n: int) -> List[dict]:
+        rows = self._query(
+            "SELECT record FROM runs WHERE script_id = ? ORDER BY ended_at DESC, id DESC LIMIT ?",
+            (script_id, max(0, n)),
+        )
+        return _records(reversed(rows))
+
+    def since(self, since_epoch: float) -> List[dict]:
+        rows = self._query("SELECT record FROM runs WHERE ended_at >= ? ORDER BY id", (since_epoch,))
+        return _records(rows)
+
+    def last_by_script(self, script_ids: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        if script_ids is None:
+            script_ids = [sid for (sid,) in self._query("SELECT DISTINCT script_id FROM runs WHERE script_id IS NOT NULL")]
+        out: Dict[str, dict] = {}
+        for sid in script_ids:
+            rows = self._query(
+                "SELECT record FROM runs WHERE script_id = ? ORDER BY ended_at DESC, id DESC LIMIT 1",
+                (sid,),
+            )
+            for e in _records(rows):
+                out[sid] = e
+        return out
+
+    def iter_all(self, batch: int = 1000) -> Iterator[dict]:
+        last_id = 0
+        while True:
+            rows = self._query("SELECT id, record FROM runs WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch))
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield from _records((raw,) for _, raw in rows)
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM runs")[0][0]
+
+def open_store() -> Optional[RunStore]:
+    """
+    The run store readers should query, or None to read the JSONL log (store disabled,
+    or not created yet).
+    """
+
+    if not store_enabled() or not DB_PATH.exists():
+        return None
+    return RunStore(DB_PATH)
+
+def import_logs(store: RunStore) -> int:
+    """
+    Backfills the store from the JSONL log and its segments (safe to repeat).
+    Returns how many records were added.
+    """
+
+    added = 0
+    batch: List[dict] = []
+    for e in iter_records():
+        batch.append(e)
+        if len(batch) >= IMPORT_BATCH:
+            added += store.insert(batch)
+            batch = []
+    if batch:
+        added += store.insert(batch)
+    return added
@@ -1,166 +1,173 @@
+import heapq
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional, Tuple
-
-from zoneinfo import ZoneInfo
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 
 from .registry import Script
+from .compiled_schedule import CompiledSchedule, compile_schedule
+
+def _compiled(script: Script) -> Optional[CompiledSchedule]:
+    c = getattr(script, "compiled", None)
+    if c is None and (getattr(script, "schedule", None) or {}).get("type") in ("interval", "time"):
+        c = compile_schedule(script.schedule)
+    return c
 
 def get_interval_seconds(script: Script) -> Optional[float]:
-    sched = getattr(script, "schedule", None) or {}
-    if sched.get("type") != "interval":
-        return None
-    try:
-        seconds = float(sched.get("seconds"))
-    except Exception:
-        return None
-    return seconds if seconds > 0 else None
-
-def _parse_hhmm(s: str) -> Optional[tuple[int, int]]:
-    try:
-        parts = s.strip().split(":")
-        if len(parts) != 2:
-            return None
-        hh = int(parts[0])
-        mm = int(parts[1])
-        if not(0 <= hh <= 23 and 0 <= mm <= 59):
-            return None
-        return hh, mm
-    except Exception:
+    c = _compiled(script)
+    if c is None or c.kind != "interval":
         return None
+    return c.interval
 
-def _today_key(now_ts: float, tz: ZoneInfo) -> str:
-    dt = datetime.fromtimestamp(now_ts, tz=tz)
-    return dt.strftime("%Y-%m-%d")
+def _day_key(dt: datetime) -> str:
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
 
 def due_to_run(script: Script, state: Dict[str, Any], now: float) -> Tuple[bool, Optional[float]]:
     """
     Returns (is_due, seconds_interval)
     """
 
-    sched = getattr(script, "schedule", None) or {}
-    stype = sched.get("type")
+    c = _compiled(script)
+    if c is None:
+        return False, None
 
     # Interval
-    if stype == "interval":
-        interval = get_interval_seconds(script)
-        if interval is None:
-            return False, None
-
+    if c.kind == "interval":
         last = state.get(script.id, {}).get("last_fired_at")
         if not isinstance(last, (int, float)):
-            return True, interval
+            return True, c.interval
         
-        return (now - float(last)) >= interval, interval
+        return (now - float(last)) >= c.interval, c.interval
     
-    if stype == "time":
-        at = sched.get("at")
-        tzname = sched.get("tz") or "America/New_York"
-        try:
-            tz = ZoneInfo(tzname)
-        except Exception:
-            tz = ZoneInfo("America/New_York")
-        
-        now_dt = datetime.fromtimestamp(now, tz=tz)
-        today_key = now_dt.strftime("%Y-%m-%d")
-
-        # Day of week
-        dow = sched.get("days")
-        if isinstance(dow, list) and dow:
-            try:
-                allowed = {int(d) for d in dow}
-                if now_dt.isoweekday() not in allowed:
-                    return False, None
-            except Exception: 
-                return False, None
-        
-        # Month
-        months = sched.get("months")
-        if isinstance(months, list) and months:
-            try:
-                allowed_months = {int(m) for m in months}
-                if now_dt.month not in allowed_months:
-                    return False, None
-            except Exception:
-                return False, None
-        
-        # Day of month
-        dom = sched.get("dom")
-        if isinstance(months, list) and months and isinstance(dom, list) and dom:
-            try:
-                allowed_dom = {int(d) for d in dom}
-                if now_dt.day not in allowed_dom:
-                    return False, None
-            except Exception:
-                return False, None
-
-        # Normalize 
-        times: list[str]
-        if isinstance(at, str):
-            times = [at]
-        elif isinstance(at, list):
-            times = [x for x in at if isinstance(x, str)]
-        else:
-            return False, None
-        
-        # Parse valid times
-        parsed: list[tuple[int, int, str]] = []
-        for t in times:
-            hhmm = _parse_hhmm(t)
-            if hhmm is None:
-                continue
-            hh, mm = hhmm
-            parsed.append((hh, mm, f"{hh:02d}:{mm:02d}"))
-        
-        if not parsed:
-            return False, None
-        
-        fired = state.get(script.id, {}).get("fired_times")
-        fired_set = set(fired) if isinstance(fired, list) else set()
-
-        parsed.sort()
-        for hh, mm, key in parsed:
-            scheduled_dt = now_dt.replace(hour=hh, minute=mm, second=0, microsecond=0)
-            if now_dt >= scheduled_dt and key not in fired_set:
-                state.setdefault(script.id, {})["_pending_time_key"] = key
-                state.setdefault(script.id, {})["_pending_day"] = today_key
-                return True, None
-            
+    now_dt = datetime.fromtimestamp(now, tz=c.tz)
+
+    # Day of week / month / day of month
+    if not c.day_allowed(now_dt):
         return False, None
 
+    today_key = _day_key(now_dt)
+    entry = state.get(script.id, {})
+    fired = entry.get("fired_times") if entry.get("last_fired_day") == today_key else None
+
+    minute_now = now_dt.hour * 60 + now_dt.minute
+    for minute, key in zip(c.minutes, c.keys):
+        if minute > minute_now:
+            break
+        if fired and key in fired:
+            continue
+        pending = state.setdefault(script.id, {})
+        pending["_pending_time_key"] = key
+        pending["_pending_day"] = today_key
+        return True, None
+        
     return False, None
 
 def mark_fired(script: Script, state: Dict[str, Any], fired_at: float) -> None:
-    sched = getattr(script, "schedule", None) or {}
-    stype = sched.get("type")
+    c = _compiled(script)
+    if c is None:
+        return
 
-    if stype == "interval":
+    if c.kind == "interval":
         state.setdefault(script.id, {})["last_fired_at"] = fired_at
         return
     
-    if stype == "time":
-        tzname = sched.get("tz") or "America/New_York"
-        try:
-            tz = ZoneInfo(tzname)
-        except Exception:
-            tz = ZoneInfo("America/New_York")
-        
-        day = _today_key(fired_at, tz)
+    day = _day_key(datetime.fromtimestamp(fired_at, tz=c.tz))
+
+    entry = state.setdefault(script.id, {})
+
+    if entry.get("last_fired_day") != day:
+        entry["last_fired_day"] = day
+        entry["fired_times"] = []
 
-        entry = state.setdefault(script.id, {})
+    key = entry.pop("_pending_time_key", None)
+    entry.pop("_pending_day", None)
 
-        if entry.get("last_fired_day") != day:
-            entry["last_fired_day"] = day
-            entry["fired_times"] = []
+    if isinstance(key, str):
+        ft = entry.get("fired_times")
+        if not isinstance(ft, list):
+            ft = []
+        if key not in ft:
+            ft.append(key)
+        entry["fired_times"] = ft
 
-        key = entry.pop("_pending_time_key", None)
-        entry.pop("_pending_day", None)
+# Time schedules that never match (e.g. Feb 31) stop looking after this many days
+_MAX_LOOKAHEAD_DAYS = 366 * 4
+
+def next_due_at(script: Script, state: Dict[str, Any], now: float) -> Optional[float]:
+    """
+    Returns the earliest timestamp >= now at which due_to_run would report the script due,
+    or None if it never will.
+    """
+
+    c = _compiled(script)
+    if c is None:
+        return None
+
+    if c.kind == "interval":
+        last = state.get(script.id, {}).get("last_fired_at")
+        if not isinstance(last, (int, float)):
+            return now
+        return max(now, float(last) + c.interval)
+
+    now_dt = datetime.fromtimestamp(now, tz=c.tz)
+    entry = state.get(script.id, {})
+    fired = entry.get("fired_times") if entry.get("last_fired_day") == _day_key(now_dt) else None
+
+    today = now_dt.date()
+    for offset in range(_MAX_LOOKAHEAD_DAYS):
+        day = today + timedelta(days=offset)
+        if not c.day_allowed(day):
+            continue
+
+        for minute, key in zip(c.minutes, c.keys):
+            if offset == 0 and fired and key in fired:
+                continue
+            ts = datetime(day.year, day.month, day.day, minute // 60, minute % 60, tzinfo=c.tz).timestamp()
+            # Missed slots earlier today are still due (same catch-up as due_to_run)
+            return max(ts, now)
+
+    return None
+
+class DeadlineScheduler:
+    """
+    Min-heap of next fire timestamps for interval/time scripts.
+    Each script's deadline is computed once (next_due_at) and only recomputed after it fires
+    or its manifest changes; stale heap entries are skipped lazily.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._deadline: Dict[str, float] = {}
+
+    def rebuild(self, scripts: Dict[str, Script], state: Dict[str, Any], now: float) -> None:
+        self._heap = []
+        self._deadline = {}
+        for s in scripts.values():
+            if s.enabled and (s.schedule or {}).get("type") in ("interval", "time"):
+                self.reschedule(s, state, now)
+
+    def reschedule(self, script: Script, state: Dict[str, Any], now: float) -> None:
+        self.set_deadline(script.id, next_due_at(script, state, now))
+
+    def set_deadline(self, script_id: str, ts: Optional[float]) -> None:
+        if ts is None:
+            self._deadline.pop(script_id, None)
+            return
+        self._deadline[script_id] = ts
+        heapq.heappush(self._heap, (ts, script_id))
+
+    def next_deadline(self) -> Optional[float]:
+        while self._heap:
+            ts, sid = self._heap[0]
+            if self._deadline.get(sid) == ts:
+                return ts
+            heapq.heappop(self._heap)
+        return None
 
-        if isinstance(key, str):
-            ft = entry.get("fired_times")
-            if not isinstance(ft, list):
-                ft = []
-            if key not in ft:
-                ft.append(key)
-            entry["fired_times"] = ft
-        return 
+    def pop_due(self, now: float) -> List[str]:
+        due: List[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            ts, sid = heapq.heappop(self._heap)
+            if self._deadline.get(sid) == ts:
+                del self._deadline[sid]
+                due.append(sid)
+        return due
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .events import (
+    get_idle_seconds_macos,
+    get_idle_seconds_macos_async,
+    get_local_ip,
+    get_local_ip_async,
+    list_running_apps_macos,
+    list_running_apps_macos_async,
+)
+from .ingest import IngestSocket, RateLimiter, _rate_from_env, parse_batch
+from .netwatch import RouteMonitor, netlink_available
+from .procwatch import ProcessTracker
+from .wakeup import Waker
+
+SOURCES_STATS_PATH = Path(__file__).resolve().parent.parent / "data" / "sources.json"
+
+# Events waiting for the dispatcher; sources drop (and count) beyond this
+EVENT_QUEUE_SIZE = 1024
+
+NETWORK_CHANGE_COOLDOWN_SECONDS = 2.0
+
+class EventSource:
+    """
+    Base class for daemon event sources.
+    The daemon calls poll() every `interval` seconds on a dedicated thread (or, in the
+    asyncio runtime, awaits poll_async() when a subclass defines it) and queues the
+    returned events for dispatch. A source keeps whatever state it needs to turn
+    readings into events; `timeout` bounds its own blocking calls, and polls that
+    take longer are counted as overruns.
+    An event-driven source returns an fd from fileno(): poll() then also runs as soon
+    as it becomes readable, and `interval` may be None to poll only then.
+    `provides` lists the event types it can emit; the daemon only runs a source while
+    some enabled script subscribes to one of them (a source that declares nothing
+    always runs; "*" means any type no other source provides). Stopping a source discards it: a restart starts from a fresh instance.
+    """
+
+    name = "source"
+    interval: Optional[float] = 1.0
+    timeout = 5.0
+    provides: Tuple[str, ...] = ()
+
+    def poll(self) -> List[dict]:
+        raise NotImplementedError
+
+    def fileno(self) -> Optional[int]:
+        return None
+
+    def take_counts(self) -> Tuple[int, int]:
+        # (rejected, rate_limited) inputs since the last call, for sources that filter what they receive
+        return 0, 0
+
+    poll_async: Optional[Callable] = None
+
+    def close(self) -> None:
+        pass
+
+@dataclass
+class SourceStats:
+    polls: int = 0
+    events: int = 0
+    dropped: int = 0
+    # Input a source discarded itself: malformed, or over a sender's rate
+    rejected: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    overruns: int = 0
+    last_poll_seconds: float = 0.0
+    max_poll_seconds: float = 0.0
+    total_poll_seconds: float = 0.0
+
+    def record(self, source: EventSource, duration: float) -> None:
+        rejected, rate_limited = source.take_counts()
+        self.rejected += rejected
+        self.rate_limited += rate_limited
+        self.polls += 1
+        self.last_poll_seconds = duration
+        self.max_poll_seconds = max(self.max_poll_seconds, duration)
+        self.total_poll_seconds += duration
+        if duration > source.timeout:
+            self.overruns += 1
+
+class EventQueue:
+    """
+    Bounded, thread-safe queue between sources and the dispatcher.
+    put() never blocks: when the dispatcher falls behind, events are dropped and counted.
+    """
+
+    def __init__(self, wake: Callable[[], None], maxsize: int = EVENT_QUEUE_SIZE):
+        self._q: "queue.Queue[dict]" = queue.Queue(maxsize=maxsize)
+        self._wake = wake
+
+    def put(self, events: List[dict], stats: SourceStats) -> None:
+        for ev in events:
+            try:
+                self._q.put_nowait(ev)
+                stats.events += 1
+            except queue.Full:
+                stats.dropped += 1
+        if events:
+            self._wake()
+
+    def drain(self) -> List[dict]:
+        out = []
+        while True:
+            try:
+                out.append(self._q.get_nowait())
+            except queue.Empty:
+                return out
+
+def poll_once(source: EventSource, stats: SourceStats) -> List[dict]:
+    t0 = time.monotonic()
+    try:
+        events = source.poll() or []
+    except Exception:
+        stats.errors += 1
+        events = []
+    stats.record(source, time.monotonic() - t0)
+    return events
+
+async def poll_once_async(source: EventSource, stats: SourceStats) -> List[dict]:
+    import asyncio
+
+    t0 = time.monotonic()
+    try:
+        if source.poll_async is not None:
+            events = await source.poll_async() or []
+        else:
+            events = await asyncio.to_thread(source.poll) or []
+    except Exception:
+        stats.errors += 1
+        events = []
+    stats.record(source, time.monotonic() - t0)
+    return events
+
+def next_poll_timeout(source: EventSource, elapsed: float) -> Optional[float]:
+    """
+    How long to wait before the next poll; None waits for the source's fd alone.
+    """
+
+    interval = source.interval
+    if interval is None:
+        return None if source.fileno() is not None else 1.0
+    return max(0.0, interval - elapsed)
+
+class SourceThread(threading.Thread):
+    def __init__(self, source: EventSource, events: EventQueue, stats: SourceStats):
+        super().__init__(name=f"source-{source.name}", daemon=True)
+        self.source = source
+        self.events = events
+        self.stats = stats
+        self.stop_event = threading.Event()
+        self._waker = Waker()
+
+    def run(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.monotonic()
+                self.events.put(poll_once(self.source, self.stats), self.stats)
+                fd = self.source.fileno()
+                timeout = next_poll_timeout(self.source, time.monotonic() - t0)
+                self._waker.wait(timeout, () if fd is None else (fd,))
+        finally:
+            close_source(self.source)
+            self._waker.close()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self._waker.wake()
+
+# Registered source factories, in registration order
+_factories: Dict[str, Callable[[], EventSource]] = {}
+
+def register_source(factory: Callable[[], EventSource], name: Optional[str] = None) -> None:
+    """
+    Adds an event source to every daemon started afterwards. `factory` is an
+    EventSource subclass or any callable returning an instance; registering a name
+    again replaces the earlier source (so a plugin can swap out a built-in one).
+    """
+
+    _factories[name or getattr(factory, "name", None) or factory.__name__] = factory
+
+def load_plugins(spec: Optional[str] = None) -> List[str]:
+    """
+    Imports the comma-separated entries of CONTROL_CORE_SOURCES. A `module` entry is
+    imported (and is expected to call register_source); a `module:attr` entry registers
+    that factory. Returns error messages for entries that failed.
+    """
+
+    spec = os.environ.get("CONTROL_CORE_SOURCES", "") if spec is None else spec
+    errors = []
+    for entry in (e.strip() for e in spec.split(",")):
+        if not entry:
+            continue
+        try:
+            module_path, _, attr = entry.partition(":")
+            m = importlib.import_module(module_path)
+            if attr:
+                register_source(getattr(m, attr))
+        except Exception as e:
+            errors.append(f"{entry}: {e!r}")
+    return errors
+
+def source_factories() -> Dict[str, Callable[[], EventSource]]:
+    return dict(_factories)
+
+def wanted_sources(factories: Dict[str, Callable[[], EventSource]], event_types: Set[str]) -> Set[str]:
+    """
+    Names of the sources that can emit any of event_types (plus those that don't say).
+    Catch-all ("*") sources are wanted when some type isn't provided by any other source.
+    """
+
+    claimed: Set[str] = set()
+    for factory in factories.values():
+        provides = getattr(factory, "provides", None) or ()
+        if "*" not in provides:
+            claimed.update(provides)
+    unclaimed = bool(event_types - claimed)
+
+    out = set()
+    for name, factory in factories.items():
+        provides = getattr(factory, "provides", None)
+        if not provides or event_types.intersection(provides) or ("*" in provides and unclaimed):
+            out.add(name)
+    return out
+
+def close_source(source: EventSource) -> None:
+    try:
+        source.close()
+    except Exception:
+        pass
+
+def save_source_stats(stats: Dict[str, SourceStats]) -> None:
+    SOURCES_STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    data = {"updated_at": time.time(), "sources": {name: asdict(s) for name, s in stats.items()}}
+    tmp = SOURCES_STATS_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, SOURCES_STATS_PATH)
+
+def load_source_stats() -> Optional[dict]:
+    try:
+        return json.loads(SOURCES_STATS_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+# Built-in sources
+
+class IdleSource(EventSource):
+    """
+    Emits an "idle" sample ({"type": "idle", "idle_seconds": x}) every poll; the
+    dispatcher turns samples into idle triggers per script threshold.
+    """
+
+    name = "idle"
+    interval = 0.5
+    provides = ("idle",)
+
+    def poll(self) -> List[dict]:
+        idle_seconds = get_idle_seconds_macos(timeout=self.timeout)
+        return [] if idle_seconds is None else [{"type": "idle", "idle_seconds": idle_seconds}]
+
+    async def poll_async(self) -> List[dict]:
+        idle_seconds = await get_idle_seconds_macos_async(timeout=self.timeout)
+        return [] if idle_seconds is None else [{"type": "idle", "idle_seconds": idle_seconds}]
+
+class AppSource(EventSource):
+    """
+    app_open / app_close with the raw app name: /proc process tracking on Linux,
+    osascript's GUI application list on macOS. The first poll only primes.
+    """
+
+    name = "apps"
+    interval = 1.5
+    provides = ("app_open", "app_close")
+
+    def __init__(self):
+        self.tracker = ProcessTracker() if ProcessTracker.available() else None
+        self.last_apps: Optional[set] = None
+
+    def _diff(self, cur_apps: set) -> List[dict]:
+        last_apps, self.last_apps = self.last_apps, cur_apps
+        if last_apps is None:
+            return []
+        return self._events(cur_apps - last_apps, last_apps - cur_apps)
+
+    @staticmethod
+    def _events(opened: set, closed: set) -> List[dict]:
+        return [{"type": "app_open", "app": name} for name in sorted(opened)] + [
+            {"type": "app_close", "app": name} for name in sorted(closed)
+        ]
+
+    def poll(self) -> List[dict]:
+        if self.tracker is not None:
+            return self._events(*self.tracker.poll())
+        return self._diff(list_running_apps_macos(timeout=self.timeout))
+
+    async def poll_async(self) -> List[dict]:
+        if self.tracker is not None:
+            return self._events(*self.tracker.poll())
+        return self._diff(await list_running_apps_macos_async(timeout=self.timeout))
+
+class NetworkSource(EventSource):
+    """
+    network_up / network_down from the local routing IP, debounced by
+    NETWORK_CHANGE_COOLDOWN_SECONDS. The first poll only primes.
+    """
+
+    name = "network"
+    interval = 0.5
+    timeout = 1.0
+    provides = ("network_up", "network_down")
+
+    def __init__(self):
+        self.last_net_up: Optional[bool] = None
+        self.last_change = 0.0
+
+    def _events(self, ip: Optional[str]) -> List[dict]:
+        now = time.time()
+        net_up = ip is not None
+        if self.last_net_up is None:
+            self.last_net_up = net_up
+            return []
+        if net_up == self.last_net_up or now - self.last_change < NETWORK_CHANGE_COOLDOWN_SECONDS:
+            return []
+        self.last_change = now
+        self.last_net_up = net_up
+        return [{"type": "network_up", "ip": ip} if net_up else {"type": "network_down"}]
+
+    def poll(self) -> List[dict]:
+        return self._events(get_local_ip(timeout=self.timeout))
+
+    async def poll_async(self) -> List[dict]:
+        return self._events(await get_local_ip_async(timeout=self.timeout))
+
+class NetlinkNetworkSource(EventSource):
+    """
+    Linux network_up / network_down from netwatch.RouteMonitor: rtnetlink notifications
+    (or /proc/net/route diffs every 2s where netlink is unavailable), so nothing runs
+    while the network is unchanged. Events carry the default route's interface and
+    local address. Transitions within NETWORK_CHANGE_COOLDOWN_SECONDS of the previous
+    one are re-evaluated when the cooldown ends rather than dropped.
+    """
+
+    name = "network"
+    interval: Optional[float] = None
+    timeout = 1.0
+    provides = NetworkSource.provides
+
+    def __init__(self):
+        self.monitor = RouteMonitor()
+        if self.monitor.fileno() is None:
+            self.interval = 2.0
+        self.base_interval = self.interval
+        self.monitor.changed()
+        self.iface, self.ip = self.monitor.state()
+        self.last_change = 0.0
+        self.pending = False
+
+    def fileno(self) -> Optional[int]:
+        return self.monitor.fileno()
+
+    def poll(self) -> List[dict]:
+        if not self.monitor.changed() and not self.pending:
+            return []
+
+        now = time.time()
+        wait = self.last_change + NETWORK_CHANGE_COOLDOWN_SECONDS - now
+        if wait > 0:
+            self.pending = True
+            self.interval = wait if self.base_interval is None else min(wait, self.base_interval)
+            return []
+        self.pending = False
+        self.interval = self.base_interval
+
+        iface, ip = self.monitor.state()
+        was_up = self.iface is not None
+        prev_iface, self.iface, self.ip = self.iface, iface, ip
+        if (iface is not None) == was_up:
+            return []
+
+        self.last_change = now
+        if iface is not None:
+            return [{"type": "network_up", "ip": ip, "interface": iface}]
+        return [{"type": "network_down", "interface": prev_iface}]
+
+    def close(self) -> None:
+        self.monitor.close()
+
+def network_source() -> EventSource:
+    """
+    NetlinkNetworkSource on Linux, routing-IP polling (NetworkSource) elsewhere.
+    """
+
+    if netlink_available():
+        return NetlinkNetworkSource()
+    return NetworkSource()
+
+network_source.provides = NetworkSource.provides
+
+class IngestSource(EventSource):
+    """
+    Events pushed by other programs over the ingestion socket (ingest.INGEST_PATH),
+    any type but the internal ones. Runs while a script subscribes to a type no
+    built-in source provides, and only wakes when a datagram arrives. Invalid events
+    and those over the sender's rate (CONTROL_CORE_INGEST_RATE events/s) are dropped
+    and counted (SourceStats.rejected / rate_limited). If the socket can't be bound (e.g. another
+    daemon holds it), binding is retried every 30s.
+    """
+
+    name = "ingest"
+    interval: Optional[float] = None
+    timeout = 0.05
+    provides = ("*",)
+
+    def __init__(self):
+        self.sock: Optional[IngestSocket] = None
+        self.limiter = RateLimiter(_rate_from_env())
+        self.rejected = 0
+        self.limited = 0
+        self._bind()
+
+    def _bind(self) -> None:
+        try:
+            self.sock = IngestSocket()
+            self.interval = None
+        except OSError as e:
+            print(f"Event ingestion socket unavailable: {e}")
+            self.sock = None
+            self.interval = 30.0
+
+    def fileno(self) -> Optional[int]:
+        return self.sock.fileno() if self.sock is not None else None
+
+    def poll(self) -> List[dict]:
+        if self.sock is None:
+            self._bind()
+            return []
+
+        out = []
+        for data, key, sender in self.sock.recv():
+            events, bad = parse_batch(data)
+            self.rejected += bad
+            allowed = self.limiter.take(key, len(events)) if events else 0
+            self.limited += len(events) - allowed
+            for ev in events[:allowed]:
+                ev["source"] = "ingest"
+                if sender is not None:
+                    ev["sender"] = sender
+                out.append(ev)
+        return out
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def take_counts(self) -> Tuple[int, int]:
+        counts = self.rejected, self.limited
+        self.rejected = self.limited = 0
+        return counts
+
+register_source(IdleSource)
+register_source(AppSource)
+register_source(network_source, name="network")
+register_source(IngestSource)
@@ -1,32 +1,17 @@
-import json
-from collections import defaultdict, deque
-from pathlib import Path
-from typing import Any, Dict, Iterable, Tuple
+import math
+from collections import defaultdict
+from typing import Dict
 
-LOG_PATH = Path(__file__).resolve().parent.parent / "data" / "logs.jsonl"
-
-def _iter_events() -> Iterable[dict]:
-    if not LOG_PATH.exists():
-        return []
-    
-    with LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+from .log_rotate import tail_records
+from .runstore import open_store
 
 def compute_stats(last_n: int=200) -> Dict[str, dict]:
     """
     Compute per-script stats over the last_n events (global), not last_n per script.
     """
 
-    recent = deque(maxlen=last_n)
-    for e in _iter_events():
-        recent.append(e)
+    store = open_store()
+    recent = store.last(last_n) if store is not None else tail_records(last_n)
     
     per = defaultdict(lambda: {
         "runs": 0,
@@ -60,4 +45,43 @@ def compute_stats(last_n: int=200) -> Dict[str, dict]:
         d["last_run_id"] = e.get("run_id")
         d["last_time"] = ended if ended is not None else e.get("started_at")
     
-    return dict(per)
\ No newline at end of file
+    return dict(per)
+def _percentile(sorted_vals, q: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_vals:
+        return 0.0
+    k = max(0, math.ceil(q * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+def compute_lock_stats(last_n: int = 1000) -> Dict[str, dict]:
+    """
+    Per lock_group contention over the last_n run records: runs, skips (skipped_due_to_lock),
+    skip rate, and p50/p95/max/total of lock_wait_seconds.
+    """
+
+    store = open_store()
+    if store is not None:
+        recent = store.last(last_n, lock_group_only=True)
+    else:
+        recent = tail_records(last_n, lambda e: bool(e.get("lock_group")))
+
+    waits = defaultdict(list)
+    per = defaultdict(lambda: {"runs": 0, "skips": 0})
+    for e in recent:
+        group = e["lock_group"]
+        d = per[group]
+        d["runs"] += 1
+        if e.get("skipped_due_to_lock"):
+            d["skips"] += 1
+        w = e.get("lock_wait_seconds")
+        if isinstance(w, (int, float)):
+            waits[group].append(float(w))
+
+    for group, d in per.items():
+        w = sorted(waits[group])
+        d["skip_rate"] = d["skips"] / d["runs"] if d["runs"] else 0.0
+        d["p50_wait"] = _percentile(w, 0.50)
+        d["p95_wait"] = _percentile(w, 0.95)
+        d["max_wait"] = w[-1] if w else 0.0
+        d["total_wait"] = sum(w)
+    return dict(per)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Tuple
+
+from .registry import Script
+from .events import normalize_app_name
+
+APP_EVENTS = ("app_open", "app_close")
+
+class SubscriptionIndex:
+    """
+    Precomputed event -> subscribers lookup for enabled "event" scripts.
+    App events are additionally keyed on the normalized app name, so dispatching
+    an event only touches the scripts that would accept it.
+    on_failure scripts are indexed by their target script id ("*" for any).
+    Rebuild it when RegistryCache.generation changes.
+    """
+
+    def __init__(self, scripts: Dict[str, Script]):
+        # Event type -> scripts (non-app events, and app scripts without an apps filter)
+        self.by_event: Dict[str, List[Script]] = {}
+
+        # App event type -> normalized app name -> scripts
+        self.by_app: Dict[str, Dict[str, List[Script]]] = {}
+
+        # (threshold, script), ascending threshold
+        self.idle: List[Tuple[float, Script]] = []
+
+        # Failed script id (or "*") -> on_failure scripts
+        self.on_failure: Dict[str, List[Script]] = {}
+
+        for s in scripts.values():
+            if not s.enabled:
+                continue
+            sched = s.schedule or {}
+            if sched.get("type") == "on_failure":
+                self.on_failure.setdefault(sched.get("target", "*"), []).append(s)
+                continue
+            if sched.get("type") != "event":
+                continue
+
+            wants = sched.get("events")
+            if not (isinstance(wants, list) and wants):
+                continue
+
+            for ev_type in wants:
+                if ev_type == "idle":
+                    try:
+                        self.idle.append((float(sched.get("seconds", 0)), s))
+                    except Exception:
+                        pass
+                    continue
+
+                apps = sched.get("apps") if ev_type in APP_EVENTS else None
+                if isinstance(apps, list) and apps:
+                    per_app = self.by_app.setdefault(ev_type, {})
+                    for name in {normalize_app_name(a) for a in apps if isinstance(a, str)}:
+                        per_app.setdefault(name, []).append(s)
+                else:
+                    self.by_event.setdefault(ev_type, []).append(s)
+
+        self.idle.sort(key=lambda t: t[0])
+
+    def subscribers(self, ev: dict) -> Iterable[Script]:
+        ev_type = ev.get("type")
+        if not isinstance(ev_type, str):
+            return ()
+
+        subs = self.by_event.get(ev_type, [])
+        per_app = self.by_app.get(ev_type)
+        if not per_app:
+            return subs
+
+        matched = per_app.get(normalize_app_name(ev.get("app", "")), [])
+        return subs + matched if subs else matched
+
+    def failure_handlers(self, failed_script_id: str) -> List[Script]:
+        handlers = self.on_failure.get("*", []) + self.on_failure.get(failed_script_id, [])
+        return [s for s in handlers if s.id != failed_script_id]
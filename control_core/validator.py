@@ -38,6 +38,10 @@ def validate_script_folder(folder: str) -> tuple[bool, list[str]]:
         if stype not in ("interval", "time", "event", "file_watch", "on_failure"):
             errs.append(f"Unknown schedule type: {stype}")
 
+    qp = data.get("queue_policy")
+    if qp is not None and qp not in ("drop", "coalesce", "latest", "queue"):
+        errs.append(f"Unknown queue_policy: {qp} (drop, coalesce, latest, queue)")
+
     # Recommended files
     if not (src / "__init__.py").exists():
         errs.append("Missing __init__.py (recommended; required for import-style entrypoints)")
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+import select
+from typing import Iterable, List, Optional
+
+class Waker:
+    """
+    Self-pipe the daemon sleeps on. wake() is safe to call from worker threads and
+    signal handlers; wait() returns early on a wake-up or when any extra fd is readable.
+    """
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+        os.set_blocking(self._w, False)
+
+    def wake(self) -> None:
+        try:
+            os.write(self._w, b"\0")
+        except (BlockingIOError, OSError):
+            # Pipe full (a wake-up is already pending) or closed during shutdown
+            pass
+
+    def wait(self, timeout: Optional[float], extra_fds: Iterable[int] = ()) -> List[int]:
+        """
+        Returns the extra fds that became readable.
+        """
+
+        if timeout is not None and timeout < 0:
+            timeout = 0.0
+        fds = [self._r, *extra_fds]
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self._r in ready:
+            try:
+                while os.read(self._r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        return [fd for fd in ready if fd != self._r]
+
+    def close(self) -> None:
+        for fd in (self._r, self._w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_HEADER = struct.Struct("!I")
+_MAX_FDS = 4
+
+class BackendUnavailable(OSError):
+    """
+    Raised by a backend's execute() when the run was never handed to it (worker or zygote
+    failed to start, pool closed, request could not be sent): the script has not run, so
+    the caller may run it another way. Failures after dispatch are reported as a failed run.
+    """
+
+def send_msg(sock: socket.socket, obj: Dict[str, Any], fds: Sequence[int] = ()) -> None:
+    """
+    Length-prefixed JSON over a Unix stream socket; fds ride along with the header (SCM_RIGHTS).
+    """
+
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    header = _HEADER.pack(len(body))
+    if fds:
+        socket.send_fds(sock, [header], list(fds))
+    else:
+        sock.sendall(header)
+    sock.sendall(body)
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+def recv_msg(sock: socket.socket) -> Tuple[Optional[Dict[str, Any]], List[int]]:
+    """
+    Returns (None, []) when the peer has gone away.
+    """
+
+    header, fds, _, _ = socket.recv_fds(sock, _HEADER.size, _MAX_FDS)
+    if not header:
+        return None, fds
+    if len(header) < _HEADER.size:
+        rest = _recv_exact(sock, _HEADER.size - len(header))
+        if rest is None:
+            return None, fds
+        header += rest
+    (size,) = _HEADER.unpack(header)
+    body = _recv_exact(sock, size)
+    if body is None:
+        return None, fds
+    return json.loads(body.decode("utf-8")), fds
+
+def call_entrypoint(entrypoint: str, payload_json: str) -> int:
+    """
+    Runs entrypoint in this process the way the cold `python -c` launcher does and
+    returns the exit code it would have produced. Tracebacks go to stderr.
+    """
+
+    os.environ["CONTROL_CORE_PAYLOAD"] = payload_json
+    try:
+        module_path, func_name = entrypoint.split(":")
+        m = importlib.import_module(module_path)
+
+        # Pick up edits to a script without recycling the process
+        path = getattr(m, "__file__", None)
+        if path:
+            mtime = os.stat(path).st_mtime_ns
+            seen = getattr(m, "__control_core_mtime__", None)
+            if seen is not None and seen != mtime:
+                m = importlib.reload(m)
+            m.__control_core_mtime__ = mtime
+
+        payload = json.loads(payload_json or "{}")
+        fn = getattr(m, func_name)
+        fn(payload) if fn.__code__.co_argcount >= 1 else fn()
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+
+def _run_redirected(entrypoint: str, payload_json: str, out_fd: int, err_fd: int) -> int:
+    """
+    Points fd 1/2 at the caller's pipes for one run, then restores them (closing the pipes).
+    """
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    try:
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        os.close(out_fd)
+        os.close(err_fd)
+        return call_entrypoint(entrypoint, payload_json)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+
+def serve(fd: int) -> int:
+    """
+    Worker loop: one {"op": "run"} request at a time, answered with {"exit_code": n}.
+    """
+
+    # Ctrl+C in the daemon's terminal reaches the whole process group; the daemon stops workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    sock = socket.socket(fileno=fd)
+    send_msg(sock, {"ready": True, "pid": os.getpid()})
+    while True:
+        msg, fds = recv_msg(sock)
+        if msg is None or msg.get("op") == "exit":
+            return 0
+        if msg.get("op") != "run" or len(fds) != 2:
+            for f in fds:
+                os.close(f)
+            send_msg(sock, {"exit_code": None, "error": "bad request"})
+            continue
+        code = _run_redirected(msg["entrypoint"], msg.get("payload", "{}"), fds[0], fds[1])
+        send_msg(sock, {"exit_code": code})
+
+def collect_output(fds: Sequence[int], deadline: Optional[float]) -> Tuple[Dict[int, bytes], bool]:
+    """
+    Reads the given pipe fds until all hit EOF. Returns ({fd: data}, timed_out).
+    Closes the fds.
+    """
+
+    data = {fd: b"" for fd in fds}
+    sel = selectors.DefaultSelector()
+    for fd in fds:
+        sel.register(fd, selectors.EVENT_READ)
+    try:
+        open_fds = set(fds)
+        while open_fds:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return data, True
+            for key, _ in sel.select(timeout):
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    data[key.fd] += chunk
+                else:
+                    sel.unregister(key.fd)
+                    open_fds.discard(key.fd)
+        return data, False
+    finally:
+        sel.close()
+        for fd in fds:
+            os.close(fd)
+
+def _decode(b: bytes) -> str:
+    return b.decode("utf-8", errors="replace")
+
+class _Worker:
+    def __init__(self):
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.proc = subprocess.Popen(
+                [sys.executable, "-m", "control_core.workers", str(child.fileno())],
+                pass_fds=[child.fileno()],
+                stdin=subprocess.DEVNULL,
+            )
+        finally:
+            child.close()
+        self.sock = parent
+        self.runs = 0
+        msg, _ = recv_msg(self.sock)
+        if not msg or not msg.get("ready"):
+            self.kill()
+            raise OSError("worker failed to start")
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+        self.proc.wait()
+        self.sock.close()
+
+    def stop(self) -> None:
+        try:
+            send_msg(self.sock, {"op": "exit"})
+            self.proc.wait(timeout=2.0)
+            self.sock.close()
+        except Exception:
+            self.kill()
+
+class WorkerPool:
+    """
+    Long-lived Python worker processes that keep script modules imported between runs.
+    execute() has the same contract as the cold subprocess launcher in runner: it returns
+    (returncode, stdout, stderr) or raises subprocess.TimeoutExpired. A worker that times
+    out or crashes is killed and replaced; each worker is recycled after max_runs runs.
+    """
+
+    mode = "warm"
+
+    def __init__(self, size: int = 4, max_runs: int = 200):
+        self.size = size
+        self.max_runs = max_runs
+        self._cond = threading.Condition()
+        self._idle: List[_Worker] = []
+        self._count = 0
+        self._closed = False
+
+    def _checkout(self) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise BackendUnavailable("worker pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._cond.wait()
+        try:
+            return _Worker()
+        except Exception as e:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            if isinstance(e, OSError):
+                raise BackendUnavailable(f"worker failed to start: {e}") from e
+            raise
+
+    def _checkin(self, w: _Worker, healthy: bool) -> None:
+        retire = (not healthy) or w.runs >= self.max_runs
+        with self._cond:
+            closed = self._closed
+            if retire or closed:
+                self._count -= 1
+            else:
+                self._idle.append(w)
+            self._cond.notify()
+        if not healthy:
+            w.kill()
+        elif retire or closed:
+            w.stop()
+
+    def execute(self, entrypoint: str, payload_json: str, timeout: Optional[float]) -> Tuple[int, str, str]:
+        w = self._checkout()
+        healthy = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            out_r, out_w = os.pipe()
+            err_r, err_w = os.pipe()
+            try:
+                send_msg(w.sock, {"op": "run", "entrypoint": entrypoint, "payload": payload_json}, [out_w, err_w])
+            except OSError as e:
+                for fd in (out_r, err_r):
+                    os.close(fd)
+                raise BackendUnavailable(f"could not send the run to a worker: {e}") from e
+            finally:
+                os.close(out_w)
+                os.close(err_w)
+            w.runs += 1
+
+            data, timed_out = collect_output([out_r, err_r], deadline)
+            stdout, stderr = _decode(data[out_r]), _decode(data[err_r])
+            if not timed_out:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                w.sock.settimeout(remaining)
+                try:
+                    msg, _ = recv_msg(w.sock)
+                except socket.timeout:
+                    timed_out = True
+                except OSError:
+                    # The script has run (or started): never retry it, report the lost worker below
+                    msg = None
+                finally:
+                    w.sock.settimeout(None)
+            if timed_out:
+                raise subprocess.TimeoutExpired("control_core.workers", timeout, output=stdout, stderr=stderr)
+
+            if msg is None or not isinstance(msg.get("exit_code"), int):
+                # Worker died mid-run (os._exit, segfault, OOM kill): report it like a cold process would
+                try:
+                    w.proc.wait(timeout=2.0)
+                except subprocess.TimeoutExpired:
+                    # Alive but its socket failed; _checkin kills it
+                    return 1, stdout, stderr + "\n[worker] lost contact with the worker during the run\n"
+                return w.proc.returncode if w.proc.returncode is not None else 1, stdout, stderr
+
+            healthy = True
+            return msg["exit_code"], stdout, stderr
+        finally:
+            self._checkin(w, healthy)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._cond.notify_all()
+        for w in idle:
+            w.stop()
+
+if __name__ == "__main__":
+    raise SystemExit(serve(int(sys.argv[1])))
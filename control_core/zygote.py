@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import importlib
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import FrozenSet, List, Optional, Tuple
+
+from .workers import BackendUnavailable, call_entrypoint, collect_output, recv_msg, send_msg
+
+def _child(entrypoint: str, payload_json: str, out_fd: int, err_fd: int, status_fd: int) -> None:
+    # Own process group so a timeout can take down anything the script spawned
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # The script runs in a grandchild that this process waits for, so its status is the
+    # real exit status even when it never returns to us (os._exit, signals)
+    try:
+        pid = os.fork()
+    except OSError:
+        os._exit(1)
+
+    if pid == 0:
+        os.close(status_fd)
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        os.close(out_fd)
+        os.close(err_fd)
+
+        code = 1
+        try:
+            code = call_entrypoint(entrypoint, payload_json)
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code & 0xFF)
+
+    os.close(out_fd)
+    os.close(err_fd)
+    try:
+        _, status = os.waitpid(pid, 0)
+        os.write(status_fd, str(os.waitstatus_to_exitcode(status)).encode("ascii"))
+    finally:
+        os._exit(0)
+
+def serve(fd: int) -> int:
+    """
+    Zygote loop: preload modules once, then fork one child per {"op": "run"} request.
+    Children are auto-reaped; each reports its script's exit status on the status pipe it
+    was handed.
+    """
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    sock = socket.socket(fileno=fd)
+    msg, _ = recv_msg(sock)
+    if not msg or msg.get("op") != "preload":
+        return 1
+
+    loaded = 0
+    for name in msg.get("modules", []):
+        try:
+            importlib.import_module(name)
+            loaded += 1
+        except BaseException:
+            pass
+    send_msg(sock, {"ready": True, "pid": os.getpid(), "preloaded": loaded})
+
+    while True:
+        msg, fds = recv_msg(sock)
+        if msg is None or msg.get("op") == "exit":
+            return 0
+        if msg.get("op") != "run" or len(fds) != 3:
+            for f in fds:
+                os.close(f)
+            send_msg(sock, {"pid": None, "error": "bad request"})
+            continue
+
+        try:
+            pid = os.fork()
+        except OSError as e:
+            for f in fds:
+                os.close(f)
+            send_msg(sock, {"pid": None, "error": str(e)})
+            continue
+
+        if pid == 0:
+            sock.close()
+            _child(msg["entrypoint"], msg.get("payload", "{}"), *fds)
+
+        for f in fds:
+            os.close(f)
+        send_msg(sock, {"pid": pid})
+
+def _scripts_fingerprint(scripts_dir: Path) -> FrozenSet[Tuple[str, int, int]]:
+    """
+    (path, mtime_ns, size) of every installed script's .py files and script.json, so an
+    edit, added or removed file, or manifest change (e.g. a new entrypoint) is noticed.
+    """
+
+    out = set()
+    try:
+        dirs = [e for e in os.scandir(scripts_dir) if e.is_dir()]
+    except FileNotFoundError:
+        return frozenset()
+    for d in dirs:
+        try:
+            for e in os.scandir(d.path):
+                if e.name.endswith(".py") or e.name == "script.json":
+                    st = e.stat()
+                    out.add((e.path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            continue
+    return frozenset(out)
+
+class Zygote:
+    """
+    Fork-server backend for runner.set_backend().
+    A zygote process imports control_core and every script entrypoint once, then forks a
+    child per run: each run is still its own process, but skips interpreter start-up and
+    imports and shares the preloaded memory copy-on-write. The zygote is restarted when
+    any script's .py files or manifest change (checked at most every check_interval seconds).
+    """
+
+    mode = "zygote"
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._proc: Optional[subprocess.Popen] = None
+        self._sock: Optional[socket.socket] = None
+        self._fingerprint: Optional[FrozenSet[Tuple[str, int, int]]] = None
+        self._next_check = 0.0
+
+    def _start(self) -> None:
+        from .registry import SCRIPTS_DIR, discover_scripts
+
+        self._stop()
+        self._fingerprint = _scripts_fingerprint(SCRIPTS_DIR)
+
+        modules: List[str] = ["control_core.runner"]
+        try:
+            for s in discover_scripts().values():
+                modules.append(s.entrypoint.split(":")[0])
+        except Exception:
+            pass
+
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._proc = subprocess.Popen(
+                [sys.executable, "-m", "control_core.zygote", str(child.fileno())],
+                pass_fds=[child.fileno()],
+                stdin=subprocess.DEVNULL,
+            )
+        finally:
+            child.close()
+        self._sock = parent
+
+        send_msg(parent, {"op": "preload", "modules": modules})
+        msg, _ = recv_msg(parent)
+        if not msg or not msg.get("ready"):
+            self._stop()
+            raise OSError("zygote failed to start")
+
+    def _stop(self) -> None:
+        proc, sock = self._proc, self._sock
+        self._proc = self._sock = None
+        if sock is not None:
+            try:
+                send_msg(sock, {"op": "exit"})
+            except OSError:
+                pass
+            sock.close()
+        if proc is not None:
+            try:
+                proc.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    def _ensure(self) -> socket.socket:
+        from .registry import SCRIPTS_DIR
+
+        now = time.monotonic()
+        if self._proc is not None and self._proc.poll() is None and now < self._next_check:
+            return self._sock
+        self._next_check = now + self.check_interval
+
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+        elif _scripts_fingerprint(SCRIPTS_DIR) != self._fingerprint:
+            self._start()
+        return self._sock
+
+    def _spawn(self, entrypoint: str, payload_json: str, fds: List[int]) -> Optional[int]:
+        """
+        The forked child's pid, or None when the zygote went away after taking the request
+        (the child may or may not be running; it still holds the pipes if it is).
+        """
+
+        with self._lock:
+            try:
+                sock = self._ensure()
+                send_msg(sock, {"op": "run", "entrypoint": entrypoint, "payload": payload_json}, fds)
+            except OSError as e:
+                self._stop()
+                raise BackendUnavailable(f"zygote unavailable: {e}") from e
+            try:
+                msg, _ = recv_msg(sock)
+            except OSError:
+                msg = None
+            if msg is None:
+                self._stop()
+                return None
+        if not isinstance(msg.get("pid"), int):
+            # The zygote answered without forking: nothing ran
+            with self._lock:
+                self._stop()
+            raise BackendUnavailable(f"zygote could not fork: {msg.get('error', 'no pid')}")
+        return msg["pid"]
+
+    def execute(self, entrypoint: str, payload_json: str, timeout: Optional[float]) -> Tuple[int, str, str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        st_r, st_w = os.pipe()
+        try:
+            pid = self._spawn(entrypoint, payload_json, [out_w, err_w, st_w])
+        except BaseException:
+            for fd in (out_r, err_r, st_r):
+                os.close(fd)
+            raise
+        finally:
+            for fd in (out_w, err_w, st_w):
+                os.close(fd)
+
+        data, timed_out = collect_output([out_r, err_r, st_r], deadline)
+        stdout = data[out_r].decode("utf-8", errors="replace")
+        stderr = data[err_r].decode("utf-8", errors="replace")
+        if timed_out:
+            try:
+                if pid is not None:
+                    os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+            raise subprocess.TimeoutExpired("control_core.zygote", timeout, output=stdout, stderr=stderr)
+
+        status = data[st_r].decode("ascii", errors="replace").strip()
+        try:
+            return int(status), stdout, stderr
+        except ValueError:
+            # The reporting process itself was killed (timeout kill of the group, OOM)
+            return -1, stdout, stderr + "\n[zygote] child exited without reporting a status\n"
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+if __name__ == "__main__":
+    raise SystemExit(serve(int(sys.argv[1])))